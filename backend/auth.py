@@ -1,17 +1,56 @@
+import copy
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
 from config import settings
 
 security = HTTPBearer(auto_error=False)
 
+# Verified claims keyed by SHA-256 of the token. Lookups are a single dict
+# probe on a fixed-size digest, and no entry outlives the token's own `exp`
+# (nor JWT_CACHE_MAX_TTL, which bounds how long a revoked token can linger).
+_verified: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
-    if credentials is None:
-        raise HTTPException(status_code=401, detail="Authentication required")
+_stats = {
+    "cache_hits": 0,
+    "verifications": 0,
+    "verify_ms_total": 0.0,
+    "failures": 0,
+}
+
+
+def auth_stats() -> Dict[str, Any]:
+    requests = _stats["cache_hits"] + _stats["verifications"]
+    return {
+        "cached_tokens": len(_verified),
+        "cache_hits": _stats["cache_hits"],
+        "verifications": _stats["verifications"],
+        "avg_verify_ms": round(_stats["verify_ms_total"] / _stats["verifications"], 3) if _stats["verifications"] else 0.0,
+        "failures": _stats["failures"],
+        "failure_rate": round(_stats["failures"] / requests, 4) if requests else 0.0,
+    }
 
-    token = credentials.credentials
 
+def _decode(token: str) -> Dict[str, Any]:
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+
+    entry = _verified.get(digest)
+    if entry is not None:
+        if entry[0] > now:
+            _verified.move_to_end(digest)
+            _stats["cache_hits"] += 1
+            # Callers get their own copy, so nothing they change reaches the cache.
+            return copy.deepcopy(entry[1])
+        del _verified[digest]
+
+    from jose import jwt  # imported on first verification to keep startup fast
+
+    started = time.perf_counter()
     try:
         payload = jwt.decode(
             token,
@@ -20,9 +59,31 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
             audience="authenticated",
             options={"verify_aud": False}
         )
+    finally:
+        _stats["verifications"] += 1
+        _stats["verify_ms_total"] += (time.perf_counter() - started) * 1000
+
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and settings.JWT_CACHE_SIZE > 0:
+        _verified[digest] = (min(float(exp), now + settings.JWT_CACHE_MAX_TTL), copy.deepcopy(payload))
+        while len(_verified) > settings.JWT_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return payload
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    token = credentials.credentials
+    from jose import JWTError
+
+    try:
+        payload = _decode(token)
         
         user_id = payload.get("sub")
         if not user_id:
+            _stats["failures"] += 1
             raise HTTPException(status_code=401, detail="Invalid token payload")
 
         return {
@@ -33,11 +94,19 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
             "raw": payload
         }
 
-    except JWTError as e:
-        print(f"JWT Verification Error: {str(e)}")
+    except JWTError:
+        _stats["failures"] += 1
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-def optional_auth(credentials: HTTPAuthorizationCredentials = Security(security)):
+async def optional_auth(credentials: HTTPAuthorizationCredentials = Security(security)):
     if credentials is None:
         return None
-    return verify_token(credentials)
\ No newline at end of file
+    return await verify_token(credentials)
+
+
+async def verify_stats_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """Guards operator endpoints (/stats, /metrics) with the STATS_TOKEN bearer token."""
+    if not settings.STATS_TOKEN:
+        raise HTTPException(status_code=403, detail="Set STATS_TOKEN to enable this endpoint")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode("utf-8"), settings.STATS_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid stats token")
@@ -0,0 +1,110 @@
+"""Local stand-in for the Gemini generateContent / streamGenerateContent API.
+
+Configured through environment variables so bench/run.py can start it with
+uvicorn:
+
+    BENCH_GEMINI_LATENCY      mean time to a full answer, seconds (0.3)
+    BENCH_GEMINI_JITTER       +/- uniform jitter on the latency, seconds (0.1)
+    BENCH_GEMINI_429_RATE     fraction of calls answered with 429 (0.0)
+    BENCH_GEMINI_RETRY_AFTER  Retry-After sent with a 429, seconds (1)
+    BENCH_GEMINI_CHUNKS       SSE chunks per streamed answer (8)
+    BENCH_GEMINI_WORDS        words per generated section (120)
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("BENCH_GEMINI_LATENCY", "0.3"))
+JITTER = float(os.getenv("BENCH_GEMINI_JITTER", "0.1"))
+RATE_429 = float(os.getenv("BENCH_GEMINI_429_RATE", "0.0"))
+RETRY_AFTER = os.getenv("BENCH_GEMINI_RETRY_AFTER", "1")
+CHUNKS = max(1, int(os.getenv("BENCH_GEMINI_CHUNKS", "8")))
+WORDS = int(os.getenv("BENCH_GEMINI_WORDS", "120"))
+
+VOCAB = ("system", "document", "analysis", "growth", "model", "market", "design", "process", "data", "strategy",
+         "result", "impact", "team", "quality", "future", "research", "value", "customer", "risk", "platform")
+
+app = FastAPI(title="Fake Gemini")
+counters = {"requests": 0, "throttled": 0}
+
+
+def _latency() -> float:
+    return max(0.0, LATENCY + random.uniform(-JITTER, JITTER))
+
+
+def _words(n: int) -> str:
+    return " ".join(random.choice(VOCAB) for _ in range(n))
+
+
+def _section_text(words: int) -> str:
+    bullets = max(4, words // 20)
+    return "\n".join(f"- {_words(words // bullets).capitalize()}" for _ in range(bullets))
+
+
+def _answer(body: dict) -> str:
+    prompt = body["contents"][0]["parts"][0]["text"]
+    schema = body.get("generationConfig", {}).get("responseSchema")
+    if schema:
+        fields = schema.get("items", {}).get("properties", {})
+        if "index" in fields:
+            listing = prompt.split("Sections:", 1)[-1]
+            count = len(re.findall(r"^\d+\. ", listing, re.MULTILINE)) or 1
+            return json.dumps([{"index": i, "content": _section_text(WORDS)} for i in range(count)])
+        count = 8 if "8 sections" in prompt else 5
+        return json.dumps([{"title": _words(3).title(), "description": _words(10)} for _ in range(count)])
+    return _section_text(WORDS)
+
+
+def _usage(body: dict, text: str) -> dict:
+    prompt_tokens = len(body["contents"][0]["parts"][0]["text"]) // 4
+    answer_tokens = len(text) // 4
+    return {"promptTokenCount": prompt_tokens, "candidatesTokenCount": answer_tokens,
+            "totalTokenCount": prompt_tokens + answer_tokens}
+
+
+def _throttled():
+    counters["throttled"] += 1
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": RETRY_AFTER},
+        content={"error": {"code": 429, "message": "Resource has been exhausted (fake)", "status": "RESOURCE_EXHAUSTED"}},
+    )
+
+
+@app.post("/v1beta/models/{target}")
+async def generate(target: str, request: Request):
+    counters["requests"] += 1
+    body = await request.json()
+    if RATE_429 and random.random() < RATE_429:
+        return _throttled()
+
+    text = _answer(body)
+    if target.endswith(":generateContent"):
+        await asyncio.sleep(_latency())
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": _usage(body, text),
+        }
+
+    async def events():
+        step = max(1, len(text) // CHUNKS)
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        delay = _latency() / len(pieces)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(delay)
+            chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+            if i == len(pieces) - 1:
+                chunk["candidates"][0]["finishReason"] = "STOP"
+                chunk["usageMetadata"] = _usage(body, text)
+            yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    return counters
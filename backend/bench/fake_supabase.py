@@ -0,0 +1,225 @@
+"""Local stand-in for the PostgREST and Storage endpoints the API uses.
+
+Seeds one bench user with Word and PowerPoint projects in three sizes and
+serves them from memory. Only the PostgREST features this codebase sends
+are understood: column lists, the `sections(*, feedback(*))` embed,
+eq/neq/lt/lte/gt/gte/in/is filters, order, limit, single-object Accept,
+and insert/upsert/update/delete. The keyset `or=` filter is ignored, so
+project listing always returns the first page.
+
+    BENCH_SUPABASE_URL           public base URL used in seeded image links
+    BENCH_PROJECTS_PER_CLASS     projects per (type, size) pair (5)
+    BENCH_IMAGE_EVERY            every Nth section gets an image, 0 = none (3)
+    BENCH_IMAGE_SIZE             width and height of seeded PNGs (640)
+"""
+import os
+import random
+import struct
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+BENCH_USER_ID = "00000000-0000-4000-8000-0000000be001"
+SIZES = {"small": 5, "medium": 20, "large": 60}
+DOCUMENT_TYPES = ("word", "powerpoint")
+
+BASE_URL = os.getenv("BENCH_SUPABASE_URL", "http://127.0.0.1:8102").rstrip("/")
+PER_CLASS = int(os.getenv("BENCH_PROJECTS_PER_CLASS", "5"))
+IMAGE_EVERY = int(os.getenv("BENCH_IMAGE_EVERY", "3"))
+IMAGE_SIZE = int(os.getenv("BENCH_IMAGE_SIZE", "640"))
+
+app = FastAPI(title="Fake Supabase")
+tables: Dict[str, List[dict]] = {"projects": [], "sections": [], "feedback": [], "refinements": []}
+_images: Dict[str, bytes] = {}
+
+
+def project_id(document_type: str, size: str, n: int) -> str:
+    """Stable UUID per seeded project, like the real table's ids."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"bench-{document_type}-{size}-{n}"))
+
+
+def _png(width: int, height: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    rows = []
+    for y in range(height):
+        base = (y * 255) // max(1, height - 1)
+        row = bytes(((x + base + rng.randrange(32)) & 0xFF) for x in range(width * 3))
+        rows.append(b"\x00" + row)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + chunk(b"IEND", b"")
+
+
+def _seed():
+    rng = random.Random(42)
+    words = ("platform", "growth", "research", "design", "customer", "analysis", "strategy", "impact", "team", "risk")
+    now = datetime.now(timezone.utc)
+    image_no = 0
+    for document_type in DOCUMENT_TYPES:
+        for size, count in SIZES.items():
+            for n in range(PER_CLASS):
+                pid = project_id(document_type, size, n)
+                stamp = (now - timedelta(minutes=len(tables["projects"]))).isoformat()
+                tables["projects"].append({
+                    "id": pid, "user_id": BENCH_USER_ID, "title": f"Bench {document_type} {size} {n}",
+                    "document_type": document_type, "topic": f"Benchmark topic {n}", "status": "draft",
+                    "ppt_template": "basic" if document_type == "powerpoint" else "default",
+                    "created_at": stamp, "updated_at": stamp,
+                })
+                for i in range(count):
+                    image_url = None
+                    if IMAGE_EVERY and i % IMAGE_EVERY == IMAGE_EVERY - 1:
+                        image_url = f"{BASE_URL}/storage/v1/object/public/project_assets/bench/{image_no % 16}.png"
+                        image_no += 1
+                    content = "\n".join("- " + " ".join(rng.choice(words) for _ in range(12)) for _ in range(6))
+                    tables["sections"].append({
+                        "id": f"{pid}-s{i}", "project_id": pid, "title": f"Section {i + 1}",
+                        "content": content, "order_index": i, "image_url": image_url, "version": 1,
+                        "created_at": stamp, "updated_at": stamp,
+                    })
+
+
+_seed()
+
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+}
+_RESERVED = {"select", "order", "limit", "offset", "or", "and", "on_conflict", "columns"}
+
+
+def _cast(value, sample):
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, int):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value.strip('"')
+
+
+def _matches(row: dict, params) -> bool:
+    for column, expression in params.multi_items():
+        if column in _RESERVED or "." in column:
+            continue
+        op, _, value = expression.partition(".")
+        current = row.get(column)
+        if op == "in":
+            options = [v.strip('"') for v in value.strip("()").split(",")]
+            if str(current) not in options:
+                return False
+        elif op == "is":
+            if (value == "null") != (current is None):
+                return False
+        elif op in _OPS:
+            if not _OPS[op](current, _cast(value, current)):
+                return False
+    return True
+
+
+def _order(rows: List[dict], spec: str) -> List[dict]:
+    for part in reversed([p for p in spec.split(",") if p]):
+        column, *flags = part.split(".")
+        rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse="desc" in flags)
+    return rows
+
+
+def _project(row: dict, select: str) -> dict:
+    select = select.replace(" ", "")
+    out = dict(row)
+    if "sections(" in select:
+        sections = _order([s for s in tables["sections"] if s["project_id"] == row["id"]], "order_index")
+        embed_feedback = "feedback(" in select
+        out["sections"] = [
+            {**s, "feedback": [f for f in tables["feedback"] if f.get("section_id") == s["id"]]} if embed_feedback else dict(s)
+            for s in sections
+        ]
+        return out
+    if select and select != "*":
+        return {column: row.get(column) for column in select.split(",")}
+    return out
+
+
+def _result(rows: List[dict], request: Request, status: int = 200):
+    if "vnd.pgrst.object" in request.headers.get("accept", ""):
+        if len(rows) != 1:
+            return JSONResponse(status_code=406, content={"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"})
+        return JSONResponse(status_code=status, content=rows[0])
+    return JSONResponse(status_code=status, content=rows)
+
+
+@app.get("/rest/v1/{table}")
+async def select(table: str, request: Request):
+    params = request.query_params
+    rows = [r for r in tables.get(table, []) if _matches(r, params)]
+    if params.get("order"):
+        rows = _order(rows, params["order"])
+    offset = int(params.get("offset", 0))
+    if params.get("limit"):
+        rows = rows[offset:offset + int(params["limit"])]
+    return _result([_project(r, params.get("select", "*")) for r in rows], request)
+
+
+@app.post("/rest/v1/rpc/{function}")
+async def rpc(function: str):
+    return JSONResponse(content=[])
+
+
+@app.post("/rest/v1/{table}")
+async def insert(table: str, request: Request):
+    payload = await request.json()
+    rows = payload if isinstance(payload, list) else [payload]
+    upsert = "merge-duplicates" in request.headers.get("prefer", "")
+    stored = tables.setdefault(table, [])
+    now = datetime.now(timezone.utc).isoformat()
+    created = []
+    for row in rows:
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **row}
+        existing = next((r for r in stored if r["id"] == row["id"]), None) if upsert else None
+        if existing is not None:
+            existing.update(row)
+            created.append(existing)
+        else:
+            stored.append(row)
+            created.append(row)
+    return _result(created, request, status=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update(table: str, request: Request):
+    changes = await request.json()
+    rows = [r for r in tables.get(table, []) if _matches(r, request.query_params)]
+    for row in rows:
+        row.update(changes)
+    return _result(rows, request)
+
+
+@app.delete("/rest/v1/{table}")
+async def delete(table: str, request: Request):
+    rows = [r for r in tables.get(table, []) if _matches(r, request.query_params)]
+    tables[table] = [r for r in tables.get(table, []) if r not in rows]
+    return _result(rows, request)
+
+
+@app.get("/storage/v1/object/public/{bucket}/{path:path}")
+async def public_object(bucket: str, path: str):
+    data = _images.get(path)
+    if data is None:
+        data = _images[path] = _png(IMAGE_SIZE, IMAGE_SIZE, zlib.crc32(path.encode("utf-8")))
+    return Response(content=data, media_type="image/png", headers={"Cache-Control": "public, max-age=3600"})
+
+
+@app.get("/stats")
+async def stats():
+    return {name: len(rows) for name, rows in tables.items()}
@@ -0,0 +1,128 @@
+"""Checks that `import main` stays lazy and does not get slower.
+
+Run from backend/ (exits 1 on failure, so it can gate CI):
+
+    python -m bench.import_budget                     # check
+    python -m bench.import_budget --record-baseline   # calibrate this machine
+
+The hard check is deterministic: none of LAZY_MODULES may be imported by
+`import main`. Those are loaded on first use or by the background warm-up
+in main.py, and an eager import of one of them is the usual way startup
+cost creeps back.
+
+Timing comes from `python -X importtime` (median over fresh
+interpreters). Wall-clock numbers depend on the machine, so they are
+compared against a baseline recorded on the same machine:
+--record-baseline stores the current median in --baseline (by default
+under the git-ignored bench/results/). Later runs fail when the median
+exceeds that baseline by more than --tolerance (50% by default). Record
+the baseline once per CI runner image, and again after an intended
+change in startup cost. Without a baseline (or an absolute --budget-ms /
+IMPORT_BUDGET_MS) timing is not checked: the run warns on stderr, and
+fails if --require-baseline is passed, as CI should once calibrated.
+
+tests/test_import_budget.py runs the eager-import check under pytest.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "bench", "results", "import_baseline.json")
+DEFAULT_BUDGET_MS = float(os.environ["IMPORT_BUDGET_MS"]) if os.getenv("IMPORT_BUDGET_MS") else None
+
+LAZY_MODULES = ("docx", "pptx", "lxml", "supabase", "postgrest", "storage3", "jose")
+
+# Settings without defaults; placeholders are enough to import the app.
+REQUIRED_ENV = {
+    "SUPABASE_URL": "http://127.0.0.1:1",
+    "SUPABASE_ANON_KEY": "import-budget",
+    "SUPABASE_SERVICE_ROLE_KEY": "import-budget",
+    "JWT_SECRET": "import-budget",
+    "GEMINI_API_KEY": "import-budget",
+}
+
+
+def profile() -> List[Tuple[str, int]]:
+    """One `import main` in a fresh interpreter: (module, cumulative microseconds) in import order."""
+    env = {**REQUIRED_ENV, **os.environ, "PYTHONPATH": BACKEND_DIR}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(cumulative)))
+    return rows
+
+
+def eager_imports(rows: List[Tuple[str, int]]) -> List[str]:
+    """The LAZY_MODULES that one profile() run shows were imported."""
+    return sorted({name.split(".")[0] for name, _ in rows} & set(LAZY_MODULES))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="absolute limit; overrides the baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file holding this machine's baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown over the baseline (0.5 = +50%%)")
+    parser.add_argument("--record-baseline", action="store_true", help="store the measured median as the baseline")
+    parser.add_argument("--require-baseline", action="store_true", help="fail instead of warning when there is no baseline")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to take the median over")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level packages to list")
+    args = parser.parse_args(argv)
+
+    totals: List[int] = []
+    packages: Dict[str, List[int]] = {}
+    eager = set()
+    for _ in range(args.runs):
+        rows = profile()
+        totals.append(dict(rows)["main"])
+        for name, cumulative in rows:
+            if "." not in name and name != "main":
+                packages.setdefault(name, []).append(cumulative)
+        eager.update(eager_imports(rows))
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"import main: {median_ms:.0f} ms median of {args.runs}")
+    slowest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+    for name, samples in slowest:
+        print(f"  {statistics.median(samples) / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"Imported at startup but expected to be lazy: {', '.join(sorted(eager))}")
+        failed = True
+
+    if args.record_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"median_ms": round(median_ms, 1), "python": sys.version.split()[0]}, f)
+        print(f"Baseline recorded in {args.baseline}")
+        return 1 if failed else 0
+
+    limit = args.budget_ms
+    if limit is None and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["median_ms"]
+        limit = baseline * (1 + args.tolerance)
+        print(f"Limit {limit:.0f} ms (baseline {baseline:.0f} ms + {args.tolerance:.0%})")
+    if limit is None:
+        print(f"WARNING: no baseline at {args.baseline}, import time NOT checked. "
+              "Run with --record-baseline on this machine first.", file=sys.stderr)
+        failed = failed or args.require_baseline
+    elif median_ms > limit:
+        print(f"Over the limit by {median_ms - limit:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Offline load test for the API against local Gemini and Supabase stand-ins.
+
+Run from backend/:
+
+    python -m bench.run                                  # every scenario
+    python -m bench.run --scenarios content,export_pptx_large --requests 500
+    python -m bench.run --compare bench/results/<earlier>.json
+
+Starts bench/fake_gemini.py, bench/fake_supabase.py and the API itself with
+uvicorn, runs each scenario with a fixed number of concurrent clients, and
+writes throughput, p50/p95/p99 latency and peak RSS of the API process tree
+to bench/results/. Caches are disabled unless --warm-caches is given, so
+every request exercises the full upstream and render path.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from jose import jwt
+
+from bench.fake_supabase import BENCH_USER_ID, SIZES, project_id
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+JWT_SECRET = "bench-jwt-secret"
+STATS_TOKEN = "bench-stats-token"
+
+Request = Tuple[str, str, Optional[dict]]
+
+
+def _scenarios(per_class: int) -> Dict[str, Callable[[int], Request]]:
+    scenarios: Dict[str, Callable[[int], Request]] = {
+        "outline": lambda i: ("POST", "/api/generate-outline", {"topic": f"Bench outline {i}", "documentType": "powerpoint"}),
+        "content": lambda i: ("POST", "/api/generate-content", {"sectionTitle": f"Section {i}", "topic": "Bench", "documentType": "word"}),
+        "content_stream": lambda i: ("POST", "/api/generate-content/stream", {"sectionTitle": f"Section {i}", "topic": "Bench", "documentType": "word"}),
+        "refine": lambda i: ("POST", "/api/refine-content", {"currentContent": "- one\n- two\n- three", "prompt": f"Make it punchier ({i})", "documentType": "powerpoint"}),
+        "projects_list": lambda i: ("GET", "/api/projects", None),
+        "project_detail": lambda i: ("GET", f"/api/projects/{project_id('word', 'medium', i % per_class)}", None),
+    }
+    for document_type, extension in (("word", "docx"), ("powerpoint", "pptx")):
+        for size in SIZES:
+            scenarios[f"export_{extension}_{size}"] = (
+                lambda i, t=document_type, s=size: ("POST", "/api/export-document", {"projectId": project_id(t, s, i % per_class)})
+            )
+    return scenarios
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class RSSMonitor:
+    """Samples the summed RSS of a process and its descendants (Linux /proc)."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.window_peak = 0
+        self.available = os.path.isdir("/proc")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(name))
+        tree, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            tree.append(pid)
+            stack.extend(children.get(pid, []))
+        return tree
+
+    def _rss(self) -> int:
+        total = 0
+        page = os.sysconf("SC_PAGE_SIZE")
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * page
+            except (OSError, IndexError, ValueError):
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self._rss()
+            self.peak = max(self.peak, rss)
+            self.window_peak = max(self.window_peak, rss)
+
+    def start(self):
+        if self.available:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def take_window(self) -> Optional[int]:
+        if not self.available:
+            return None
+        peak, self.window_peak = self.window_peak, 0
+        return peak
+
+
+async def run_scenario(client: httpx.AsyncClient, build: Callable[[int], Request], requests: int,
+                       concurrency: int, warmup: int) -> Dict[str, Any]:
+    for i in range(warmup):
+        method, path, body = build(requests + i)
+        await client.request(method, path, json=body)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    sizes: List[int] = []
+    counter = itertools.count()
+
+    async def worker():
+        while (i := next(counter)) < requests:
+            method, path, body = build(i)
+            started = time.perf_counter()
+            try:
+                size = 0
+                async with client.stream(method, path, json=body) as resp:
+                    async for chunk in resp.aiter_raw():
+                        size += len(chunk)
+                statuses[str(resp.status_code)] += 1
+                sizes.append(size)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "errors": requests - ok,
+        "statuses": dict(statuses),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        "avg_response_bytes": int(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def _spawn(app: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {proc.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], previous_path: str):
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    def delta(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {previous_path} ({previous['meta'].get('git_commit') or 'unknown commit'})")
+    print(f"{'scenario':<22}{'rps':>20}{'p50 ms':>20}{'p95 ms':>20}{'p99 ms':>20}")
+    for name, result in current["scenarios"].items():
+        old = previous["scenarios"].get(name)
+        if not old:
+            continue
+        cells = [f"{result[k]:.1f} ({delta(result[k], old[k])})" for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:<22}" + "".join(f"{c:>20}" for c in cells))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="all", help="comma-separated scenario names, or 'all'")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unrecorded requests before each scenario")
+    parser.add_argument("--gemini-latency", type=float, default=0.3)
+    parser.add_argument("--gemini-jitter", type=float, default=0.1)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--projects-per-class", type=int, default=5)
+    parser.add_argument("--render-mode", default="process", choices=("process", "inline"))
+    parser.add_argument("--warm-caches", action="store_true", help="leave the LLM, image, section and export caches on")
+    parser.add_argument("--port", type=int, default=8100, help="API port; the fakes use the next two")
+    parser.add_argument("--output", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    scenarios = _scenarios(args.projects_per_class)
+    names = list(scenarios) if args.scenarios == "all" else [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (known: {', '.join(scenarios)})")
+
+    api_url = f"http://127.0.0.1:{args.port}"
+    gemini_url = f"http://127.0.0.1:{args.port + 1}"
+    supabase_url = f"http://127.0.0.1:{args.port + 2}"
+    workdir = tempfile.mkdtemp(prefix="documate-bench-")
+
+    base_env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    fake_gemini_env = {
+        **base_env,
+        "BENCH_GEMINI_LATENCY": str(args.gemini_latency),
+        "BENCH_GEMINI_JITTER": str(args.gemini_jitter),
+        "BENCH_GEMINI_429_RATE": str(args.gemini_429_rate),
+    }
+    fake_supabase_env = {**base_env, "BENCH_SUPABASE_URL": supabase_url, "BENCH_PROJECTS_PER_CLASS": str(args.projects_per_class)}
+    api_env = {
+        **base_env,
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_ANON_KEY": "bench-anon-key",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-key",
+        "JWT_SECRET": JWT_SECRET,
+        "GEMINI_API_KEY": "bench-key",
+        "GEMINI_BASE_URL": f"{gemini_url}/v1beta",
+        "GEMINI_RPM": "0",
+        "GEMINI_TPM": "0",
+        "RENDER_MODE": args.render_mode,
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "images"),
+        "EXPORT_JOB_DIR": os.path.join(workdir, "exports"),
+        "STATS_TOKEN": STATS_TOKEN,
+    }
+    if not args.warm_caches:
+        api_env.update({"LLM_CACHE_ENABLED": "false", "IMAGE_CACHE_MAX_BYTES": "0",
+                        "SECTION_CACHE_MAX_BYTES": "0", "EXPORT_CACHE_MAX_BYTES": "0"})
+
+    processes = [
+        _spawn("bench.fake_gemini:app", args.port + 1, fake_gemini_env),
+        _spawn("bench.fake_supabase:app", args.port + 2, fake_supabase_env),
+    ]
+    monitor = None
+    try:
+        _wait_ready(f"{gemini_url}/stats", processes[0])
+        _wait_ready(f"{supabase_url}/stats", processes[1])
+        api = _spawn("main:app", args.port, api_env)
+        processes.append(api)
+        _wait_ready(f"{api_url}/health", api)
+
+        monitor = RSSMonitor(api.pid)
+        monitor.start()
+        token = jwt.encode({"sub": BENCH_USER_ID, "role": "authenticated", "aud": "authenticated",
+                            "exp": int(time.time()) + 24 * 3600}, JWT_SECRET, algorithm="HS256")
+
+        async def run_all() -> Dict[str, Any]:
+            results = {}
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=api_url, headers={"Authorization": f"Bearer {token}"},
+                                         timeout=300.0, limits=limits) as client:
+                for name in names:
+                    monitor.take_window()
+                    result = await run_scenario(client, scenarios[name], args.requests, args.concurrency, args.warmup)
+                    result["peak_rss_bytes"] = monitor.take_window()
+                    results[name] = result
+                    print(f"{name:<22} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.1f} ms  "
+                          f"p95 {result['p95_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  errors {result['errors']}")
+            return results
+
+        scenario_results = asyncio.run(run_all())
+        try:
+            api_stats = httpx.get(f"{api_url}/stats", headers={"Authorization": f"Bearer {STATS_TOKEN}"}, timeout=5.0).json()
+        except (httpx.HTTPError, ValueError):
+            api_stats = None
+    finally:
+        if monitor is not None:
+            monitor.stop()
+        for proc in reversed(processes):
+            proc.terminate()
+        for proc in processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "peak_rss_bytes": monitor.peak if monitor and monitor.available else None,
+        "scenarios": scenario_results,
+        "api_stats": api_stats,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nPeak RSS {report['peak_rss_bytes'] / 2 ** 20:.1f} MiB" if report["peak_rss_bytes"] else "\nPeak RSS unavailable")
+    print(f"Results written to {path}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
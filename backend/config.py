@@ -1,3 +1,4 @@
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +8,118 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     GEMINI_API_KEY: str
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    # Points at bench/fake_gemini.py for offline load tests
+    GEMINI_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta"
+
+    # Bearer token for the operator endpoints /stats and /metrics (disabled while empty)
+    STATS_TOKEN: str = ""
+
+    # Verified-JWT cache in auth.verify_token
+    JWT_CACHE_SIZE: int = 10000
+    JWT_CACHE_MAX_TTL: int = 300
+
+    # GET /projects keyset pagination (only when the request passes limit or cursor)
+    PROJECTS_PAGE_SIZE: int = 50
+    PROJECTS_MAX_PAGE_SIZE: int = 200
+
+    # POST /sections/batch limits
+    SECTIONS_BATCH_MAX_ROWS: int = 200
+    SECTIONS_BATCH_MAX_BYTES: int = 2 * 1024 * 1024
+    SECTIONS_MAX_CONTENT_CHARS: int = 100_000
+
+    # Batched feedback and refinement inserts: requests wait for their row to be
+    # written; concurrent rows share a batch, waiting at most FLUSH_INTERVAL to fill it
+    WRITE_BUFFER_MAX_BATCH: int = 100
+    WRITE_BUFFER_FLUSH_INTERVAL: float = 0.02
+    WRITE_BUFFER_MAX_PENDING: int = 5000
+    WRITE_BUFFER_MAX_RETRIES: int = 3
+    WRITE_BUFFER_ENQUEUE_TIMEOUT: float = 2.0
+
+    # Shared Gemini HTTP client
+    GEMINI_TIMEOUT: float = 60.0
+    GEMINI_HTTP2: bool = False
+    GEMINI_MAX_CONNECTIONS: int = 20
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GEMINI_KEEPALIVE_EXPIRY: float = 30.0
+    GEMINI_MAX_CONCURRENCY: int = 8
+
+    # Gemini scheduling: per-minute quotas (0 disables), 429/503 retries and adaptive concurrency
+    GEMINI_RPM: int = 1000
+    GEMINI_TPM: int = 1_000_000
+    GEMINI_MIN_CONCURRENCY: int = 1
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_RETRY_BASE_DELAY: float = 1.0
+    GEMINI_RETRY_MAX_DELAY: float = 30.0
+
+    # Per-route deadlines for Gemini work, including time spent queued and retrying
+    CONTENT_TIMEOUT: float = 45.0
+    REFINE_TIMEOUT: float = 30.0
+    OUTLINE_TIMEOUT: float = 30.0
+    DOCUMENT_SECTION_TIMEOUT: float = 90.0
+    STREAM_TIMEOUT: float = 120.0
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+
+    # Gemini response cache (in-process LRU backed by a shared SQLite file)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_TTL: int = 86400
+    LLM_CACHE_PATH: str = ".cache/llm_cache.sqlite3"
+    LLM_CACHE_REFINE: bool = False
+
+    # /generate-document fan-out (requests may ask for less, never more)
+    GENERATE_DOCUMENT_CONCURRENCY: int = 4
+
+    # Packed generation: several sections per Gemini call, sized by estimated output tokens
+    PACKED_MAX_OUTPUT_TOKENS: int = 6000
+    PACKED_MAX_SECTIONS: int = 8
+
+    # Speculative content after /generate-outline (requests opt in with "speculate";
+    # SPECULATION_ENABLED turns it on by default): the first SPECULATION_SECTIONS
+    # sections are pre-generated at bulk priority and kept per user for SPECULATION_TTL
+    SPECULATION_ENABLED: bool = False
+    SPECULATION_SECTIONS: int = 3
+    SPECULATION_TTL: float = 600.0
+    SPECULATION_MAX_USERS: int = 1000
+
+    # Background export jobs; with several API workers EXPORT_JOB_DIR must be a
+    # directory they all share, since job metadata and artifacts live there
+    EXPORT_JOB_WORKERS: int = 2
+    EXPORT_JOB_QUEUE_SIZE: int = 50
+    EXPORT_JOBS_PER_USER: int = 2
+    EXPORT_JOB_TTL: int = 3600
+    EXPORT_JOB_DIR: str = ""
+
+    # Section image downloads for exports
+    IMAGE_FETCH_CONCURRENCY: int = 8
+    IMAGE_FETCH_TIMEOUT: float = 10.0
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_CACHE_DIR: str = ".cache/images"
+    IMAGE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Document rendering: "process" (worker pool) or "inline" (tests, local dev)
+    RENDER_MODE: str = "process"
+    RENDER_WORKERS: int = 2
+    RENDER_MAX_TASKS_PER_CHILD: int = 50
+    RENDER_TIMEOUT: float = 120.0
+    SECTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EXPORT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    EXPORT_CACHE_DIR: str = ""
+
+    # Export output: files spill from memory to disk past EXPORT_SPOOL_MAX_MEMORY, and
+    # direct downloads wait up to EXPORT_INFLIGHT_WAIT for room under EXPORT_INFLIGHT_MAX_BYTES
+    EXPORT_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024
+    EXPORT_SPOOL_DIR: str = ""
+    EXPORT_INFLIGHT_MAX_BYTES: int = 256 * 1024 * 1024
+    EXPORT_INFLIGHT_WAIT: float = 10.0
+    EXPORT_SIZE_ESTIMATE: int = 4 * 1024 * 1024
+
+    # PowerPoint templates the frontend offers ("default" is the built-in blank deck).
+    # Startup reports any without a file in templates/; exports using one render blank.
+    PPT_TEMPLATES: List[str] = ["basic", "Geometric", "Scientific", "Product"]
+
+    # Templates, render workers and lazily imported libraries load in the background
+    # once the server is accepting requests; off means each loads on first use
+    STARTUP_WARMUP: bool = True
 
     class Config:
         env_file = ".env"
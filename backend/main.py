@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
 from routers import (
     generate_outline,
     generate_content,
+    generate_document,
     refine_content,
     export_document,
     projects,
@@ -11,8 +18,152 @@ from routers import (
     sections,
     refinements
 )
+from auth import auth_stats, verify_stats_token
+from supabase_client import db
+from services.ai_service import ai_service
+from services.llm_cache import llm_cache
+from services.export_jobs import export_jobs
+from services.document_service import document_service
+from services.image_cache import image_cache
+from services.template_store import template_store
+from services.render_pool import render_pool
+from services.section_cache import section_cache
+from services.export_cache import export_cache
+from services.export_stream import export_limiter
+from services.write_buffer import feedback_buffer, refinement_buffer
+from services.outline_parser import outline_stats
+from services.packed_generation import packing_stats
+from services.speculation import speculation
+from config import settings
+from services import metrics
 
-app = FastAPI(title="DocuMate API")
+# Imported lazily by their modules, preloaded by _warm_up().
+WARM_IMPORTS = ("jose.jwt", "postgrest", "storage3")
+
+
+def _warm_up_sync():
+    started = time.perf_counter()
+    for name in WARM_IMPORTS:
+        importlib.import_module(name)
+    document_service.preload()
+    templates = template_store.reload()
+    if templates["missing"]:
+        print(f"Missing PowerPoint templates: {', '.join(templates['missing'])}")
+    render_pool.start()
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+async def _warm_up():
+    """Loads what the first export or query would otherwise wait for, off the event loop."""
+    try:
+        await run_in_threadpool(_warm_up_sync)
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.start()
+    await ai_service.start()
+    await export_jobs.start()
+    await feedback_buffer.start()
+    await refinement_buffer.start()
+    warm_up = asyncio.create_task(_warm_up()) if settings.STARTUP_WARMUP else None
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    speculation.close()
+    await feedback_buffer.close()
+    await refinement_buffer.close()
+    await export_jobs.close()
+    await ai_service.close()
+    await db.close()
+    document_service.close()
+    export_cache.close()
+    render_pool.close()
+
+
+class MetricsMiddleware:
+    """Per-route request counts, latency and in-flight gauge.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed bodies pass
+    straight through; latency runs until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._paths = {}
+
+    def _route_path(self, scope) -> str:
+        route = scope.get("route")
+        if route is None or not hasattr(route, "path_regex"):
+            return "unmatched"
+        path = self._paths.get(id(route))
+        if path is None:
+            # scope["route"] is the router's own route, without the prefix it
+            # was included under; recover the prefix once from the raw path.
+            raw = scope["path"]
+            prefix = next((raw[:i] for i in range(len(raw)) if route.path_regex.match(raw[i:])), "")
+            path = self._paths[id(route)] = prefix + route.path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.http_in_flight.dec()
+            # Route templates, not raw paths, keep label cardinality bounded.
+            path = self._route_path(scope)
+            metrics.http_latency.observe(time.perf_counter() - started, scope["method"], path)
+            metrics.http_requests.inc(scope["method"], path, str(status["code"]))
+
+
+def _cache_lookups():
+    llm = llm_cache.stats()
+    jwt = auth_stats()
+    counts = {
+        "llm": (llm["memory_hits"] + llm["disk_hits"], llm["misses"]),
+        "jwt": (jwt["cache_hits"], jwt["verifications"]),
+        "image": (image_cache.hits, image_cache.misses),
+        "section": (section_cache.hits, section_cache.misses),
+        "export": (export_cache.hits, export_cache.misses),
+        "speculation": (speculation.hits, speculation.misses),
+    }
+    for cache, (hits, misses) in counts.items():
+        yield (cache, "hit"), hits
+        yield (cache, "miss"), misses
+
+
+def _queue_gauges():
+    gemini = ai_service.stats()
+    yield ("gemini_in_flight",), gemini["in_flight"]
+    yield ("gemini_queued",), gemini["queue_depth"]
+    yield ("gemini_concurrency_limit",), gemini["concurrency_limit"]
+    yield ("export_jobs_queued",), export_jobs.stats()["queue_depth"]
+    yield ("export_inflight_bytes",), export_limiter.stats()["in_flight_bytes"]
+    yield ("feedback_buffer_queued",), feedback_buffer.stats()["queue_depth"]
+    yield ("refinement_buffer_queued",), refinement_buffer.stats()["queue_depth"]
+
+
+metrics.Collected("documate_cache_lookups_total", "Cache lookups by cache and result.", "counter", ("cache", "result"), _cache_lookups)
+metrics.Collected("documate_backlog", "Current in-flight and queued work by kind.", "gauge", ("kind",), _queue_gauges)
+
+
+app = FastAPI(title="DocuMate API", lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +176,7 @@ app.add_middleware(
 app.include_router(projects.router, prefix="/api")
 app.include_router(generate_outline.router, prefix="/api")
 app.include_router(generate_content.router, prefix="/api")
+app.include_router(generate_document.router, prefix="/api")
 app.include_router(refine_content.router, prefix="/api")
 app.include_router(export_document.router, prefix="/api")
 app.include_router(feedback.router, prefix="/api")
@@ -35,6 +187,32 @@ app.include_router(refinements.router, prefix="/api")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_stats_token)])
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats", dependencies=[Depends(verify_stats_token)])
+async def stats():
+    return {
+        "auth": auth_stats(),
+        "supabase": db.stats(),
+        "gemini": ai_service.stats(),
+        "single_flight": ai_service.single_flight.stats(),
+        "llm_cache": llm_cache.stats(),
+        "export_jobs": export_jobs.stats(),
+        "image_cache": image_cache.stats(),
+        "templates": template_store.stats(),
+        "render_pool": render_pool.stats(),
+        "section_cache": section_cache.stats(),
+        "export_cache": export_cache.stats(),
+        "export_inflight": export_limiter.stats(),
+        "feedback_buffer": feedback_buffer.stats(),
+        "refinement_buffer": refinement_buffer.stats(),
+        "outline_parser": outline_stats(),
+        "packed_generation": packing_stats(),
+        "speculation": speculation.stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,25 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+import os
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 from auth import verify_token
-from supabase_client import supabase_client
-from services.document_service import document_service
-import io
+from config import settings
+from supabase_client import db
+from services.render_pool import render_pool, RenderTimeout
+from services.export_jobs import export_jobs, ExportLimitReached, ExportQueueFull
+from services.export_cache import export_cache, export_digest
+from services.export_stream import FileStreamResponse, ExportBusy, export_limiter, file_size
+from services.http_cache import etag_matches, make_etag
+from typing import Optional
 
 
 router = APIRouter()
 
-@router.post("/export-document")
-def export_document(payload: dict, user = Depends(verify_token)):
-    project_id = payload.get("projectId")
-    if not project_id:
-        raise HTTPException(status_code=400, detail="projectId is required")
+WORD_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPT_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
 
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"])
+async def _load_export(project_id: str, user: dict):
+    sb = db.postgrest(user["token"])
 
     try:
-        project_res = sb.table("projects").select("*").eq("id", project_id).single().execute()
+        project_res = await db.execute(sb.table("projects").select("*").eq("id", project_id).single(), "projects.get")
     except Exception:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -28,28 +32,127 @@ def export_document(payload: dict, user = Depends(verify_token)):
     if project["user_id"] != user["user_id"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
 
-    sections_res = sb.table("sections").select("*").eq("project_id", project_id).order("order_index").execute()
-    sections = sections_res.data or []
+    sections_res = await db.execute(sb.table("sections").select("*").eq("project_id", project_id).order("order_index"), "sections.list")
+    return project, sections_res.data or []
+
+
+def _render(project: dict, sections: list, on_progress=None):
+    if project["document_type"] == "word":
+        file = render_pool.render("word", project["title"], sections, on_progress=on_progress)
+        return file, f"{project['title']}.docx", WORD_MIME
 
     ppt_template = project.get("ppt_template", "default")
+    file = render_pool.render("powerpoint", project["title"], sections, template=ppt_template, on_progress=on_progress)
+    return file, f"{project['title']}.pptx", PPT_MIME
 
 
+def _render_cached(project: dict, sections: list, digest: str, on_progress=None):
+    cached = export_cache.get(digest)
+    if cached is not None:
+        if on_progress:
+            on_progress(len(sections), len(sections))
+        return cached
 
+    file, filename, mime = _render(project, sections, on_progress)
     try:
-        if project["document_type"] == "word":
-            file_bytes = document_service.generate_word(project["title"], sections)
-            filename = f"{project['title']}.docx"
-            mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        else:
-            file_bytes = document_service.generate_powerpoint(project["title"], sections, template=ppt_template)
-            filename = f"{project['title']}.pptx"
-            mime = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-
-        return StreamingResponse(
-            io.BytesIO(file_bytes), 
-            media_type=mime, 
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        export_cache.put(digest, project["id"], [s["id"] for s in sections if s.get("id")], file, filename, mime)
+    except Exception:
+        file.close()
+        raise
+    return file, filename, mime
+
+
+@router.post("/export-document")
+async def export_document(payload: dict, user = Depends(verify_token)):
+    """Always sends the document; conditional requests go to the GET variant."""
+    project_id = payload.get("projectId")
+    if not project_id:
+        raise HTTPException(status_code=400, detail="projectId is required")
+    return await _export(project_id, user, None)
+
+
+@router.get("/export-document/{project_id}")
+async def get_export_document(project_id: str, user = Depends(verify_token), if_none_match: Optional[str] = Header(None)):
+    """The same export, answering 304 when If-None-Match holds its current ETag."""
+    return await _export(project_id, user, if_none_match)
+
+
+async def _export(project_id: str, user: dict, if_none_match: Optional[str]):
+    project, sections = await _load_export(project_id, user)
+    digest = export_digest(project, sections)
+    etag = make_etag(digest)
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    reserved = export_cache.size_of(digest) or settings.EXPORT_SIZE_ESTIMATE
+    try:
+        await export_limiter.acquire(reserved)
+    except ExportBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    try:
+        file, filename, mime = await run_in_threadpool(_render_cached, project, sections, digest)
+    except RenderTimeout as e:
+        await export_limiter.release(reserved)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        await export_limiter.release(reserved)
         print(f"Export Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Document generation failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Document generation failed: {str(e)}")
+
+    size = file_size(file)
+    await export_limiter.resize(reserved, size)
+    return FileStreamResponse(
+        file,
+        size,
+        media_type=mime,
+        headers={"Content-Disposition": f"attachment; filename={filename}", "ETag": etag},
+        reserved=size,
+    )
+
+
+@router.post("/export-document/jobs", status_code=202)
+async def create_export_job(payload: dict, user = Depends(verify_token)):
+    project_id = payload.get("projectId")
+    if not project_id:
+        raise HTTPException(status_code=400, detail="projectId is required")
+
+    project, sections = await _load_export(project_id, user)
+
+    try:
+        digest = export_digest(project, sections)
+        job = await export_jobs.submit(user["user_id"], project_id,
+                                       lambda on_progress: _render_cached(project, sections, digest, on_progress),
+                                       total=len(sections))
+    except ExportLimitReached as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"job": job.to_dict()}
+
+
+@router.get("/export-document/jobs/{job_id}")
+async def get_export_job(job_id: str, user = Depends(verify_token)):
+    job = export_jobs.get(job_id, user["user_id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+
+    result = job.to_dict()
+    if job.status == "done":
+        result["download_url"] = f"/api/export-document/jobs/{job.id}/download"
+    return {"job": result}
+
+
+@router.get("/export-document/jobs/{job_id}/download")
+async def download_export_job(job_id: str, user = Depends(verify_token)):
+    job = export_jobs.get(job_id, user["user_id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    if not job.path or not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export file has expired, please export again")
+
+    return FileResponse(job.path, media_type=job.mime, filename=job.filename)
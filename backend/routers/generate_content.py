@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from auth import verify_token
+from config import settings
 from services.ai_service import ai_service
+from services.disconnect import cancel_on_disconnect
+from services.gemini_scheduler import Priority
+from services.prompts import content_messages
+from services.speculation import speculation
+from services.streaming import completion_events, sse_response
 
 router = APIRouter()
 
@@ -9,31 +15,27 @@ class ContentRequest(BaseModel):
     sectionTitle: str
     topic: str
     documentType: str
+    regenerate: bool = False
 
 @router.post("/generate-content")
-async def generate_content(request: ContentRequest, user = Depends(verify_token)):
-    if request.documentType.lower() == "word":
-        system_prompt = f"""Generate detailed content for: {request.sectionTitle}
-Requirements:
-- 3–4 paragraphs
-- Clear, logical flow
-- Formal and professional tone
-- Relevant to the topic: {request.topic}
-"""
+async def generate_content(request: ContentRequest, http_request: Request, user = Depends(verify_token)):
+    key = (user["user_id"], request.topic, request.sectionTitle, request.documentType)
+    if request.regenerate:
+        speculation.discard(*key)
     else:
-        system_prompt = f"""Generate slide content for: {request.sectionTitle}
-Format:
-- Title at top
-- 4–6 bullet points
-- Each point max 12–15 words
-- Topic: {request.topic}
-- Keep it clean and presentation-ready
-"""
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Generate content for section titled: {request.sectionTitle}"}
-    ]
-    result = await ai_service.generate_completion(messages)
+        speculative = speculation.take(*key)
+        if speculative is not None:
+            return {"content": speculative}
+
+    messages = content_messages(request.sectionTitle, request.topic, request.documentType)
+    result = await cancel_on_disconnect(http_request, ai_service.generate_completion(
+        messages, cache=True, bypass_cache=request.regenerate,
+        priority=Priority.INTERACTIVE, timeout=settings.CONTENT_TIMEOUT))
     if result.get("status") != 200:
         raise HTTPException(status_code=result.get("status", 500), detail=result.get("error", "AI content generation failed"))
     return {"content": result["content"]}
+
+@router.post("/generate-content/stream")
+async def generate_content_stream(request: ContentRequest, user = Depends(verify_token)):
+    messages = content_messages(request.sectionTitle, request.topic, request.documentType)
+    return sse_response(completion_events(ai_service.stream_completion(messages, timeout=settings.STREAM_TIMEOUT)))
@@ -0,0 +1,195 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import List, Optional, Set
+from auth import verify_token
+from config import settings
+from supabase_client import db
+from services.ai_service import ai_service
+from services.gemini_scheduler import Priority
+from services.export_cache import export_cache
+from services.packed_generation import generate_pack, plan_packs
+from services.prompts import content_messages
+from services.streaming import sse_event, sse_response
+
+router = APIRouter()
+
+# Generation runs that outlive their response; held here so they are not garbage collected.
+_producers: Set[asyncio.Task] = set()
+
+class OutlineSection(BaseModel):
+    title: str
+    description: str = ""
+
+class GenerateDocumentRequest(BaseModel):
+    projectId: Optional[str] = None
+    outline: Optional[List[OutlineSection]] = None
+    topic: Optional[str] = None
+    documentType: Optional[str] = None
+    concurrency: Optional[int] = None
+    regenerate: bool = False
+    overwrite: bool = False
+    packed: Optional[bool] = None
+
+
+async def _load_project(sb, project_id: str, user_id: str):
+    try:
+        res = await db.execute(sb.table("projects").select("id, user_id, topic, document_type").eq("id", project_id).single(), "projects.get")
+    except Exception:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = res.data
+    if not project or project["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Project not found")
+    sections = await db.execute(sb.table("sections").select("id, title, order_index, content, version").eq("project_id", project_id).order("order_index"), "sections.list")
+    return project, sections.data or []
+
+
+async def _save_existing(sb, project_id: str, targets: List[dict], generated: dict) -> Optional[dict]:
+    # Same versioned RPC as /sections/batch: sections edited since they were read are left alone.
+    changes = [{"id": targets[i]["id"], "version": targets[i]["version"], "content": generated[i]} for i in sorted(generated)]
+    if not changes:
+        return None
+    res = await db.execute(sb.rpc("batch_update_sections", {"p_project_id": project_id, "p_changes": changes}), "sections.batch")
+    results = res.data or []
+    return {
+        "count": sum(1 for r in results if r["result"] == "updated"),
+        "conflicts": [r["section_id"] for r in results if r["result"] == "conflict"],
+    }
+
+
+async def _save_new(sb, project_id: str, targets: List[dict], generated: dict) -> dict:
+    # A new project keeps every outline title; failed sections start out empty.
+    rows = [{**target, "project_id": project_id, "content": generated.get(i, "")} for i, target in enumerate(targets)]
+    await db.execute(sb.table("sections").insert(rows), "sections.bulk_insert")
+    return {"count": len(rows), "conflicts": []}
+
+
+@router.post("/generate-document")
+async def generate_document(request: GenerateDocumentRequest, user = Depends(verify_token)):
+    """Generates every section concurrently and streams per-section progress as SSE.
+
+    With a projectId the project's empty sections (all of them with
+    `overwrite`; for an empty project, the given outline) are generated and
+    written back in one call, which still happens if the client disconnects
+    midway. Existing sections are saved with the version they were read at,
+    so one edited in the meantime is reported as a conflict, not replaced.
+    Without a projectId
+    topic/documentType/outline are required and nothing is persisted.
+    With `packed` (the default for PowerPoint) several sections share one
+    Gemini call; any section missing from a packed answer is generated on
+    its own.
+    """
+    sb = None
+    if request.projectId:
+        sb = db.postgrest(user["token"])
+        project, existing = await _load_project(sb, request.projectId, user["user_id"])
+        topic = request.topic or project["topic"]
+        document_type = request.documentType or project["document_type"]
+        if existing:
+            if request.outline:
+                raise HTTPException(status_code=409, detail="Project already has sections")
+            targets = [{"id": s["id"], "title": s["title"], "order_index": s["order_index"], "version": s["version"]}
+                       for s in existing if request.overwrite or not (s.get("content") or "").strip()]
+            if not targets:
+                raise HTTPException(status_code=409, detail="Every section already has content; pass overwrite to regenerate")
+        else:
+            targets = [{"title": s.title, "order_index": i} for i, s in enumerate(request.outline or [])]
+    else:
+        if not (request.outline and request.topic and request.documentType):
+            raise HTTPException(status_code=400, detail="projectId or outline, topic and documentType are required")
+        topic, document_type = request.topic, request.documentType
+        targets = [{"title": s.title, "order_index": i} for i, s in enumerate(request.outline)]
+
+    if not targets:
+        raise HTTPException(status_code=400, detail="No sections to generate")
+
+    limit = settings.GENERATE_DOCUMENT_CONCURRENCY
+    if request.concurrency:
+        limit = max(1, min(request.concurrency, limit))
+    semaphore = asyncio.Semaphore(limit)
+    packed = request.packed if request.packed is not None else document_type.lower() == "powerpoint"
+    if packed:
+        packs = plan_packs([t["title"] for t in targets], document_type)
+    else:
+        packs = [[i] for i in range(len(targets))]
+
+    async def generate(index: int, target: dict):
+        async with semaphore:
+            try:
+                messages = content_messages(target["title"], topic, document_type)
+                result = await ai_service.generate_completion(messages, cache=True, bypass_cache=request.regenerate,
+                                                              priority=Priority.BULK, timeout=settings.DOCUMENT_SECTION_TIMEOUT)
+            except Exception as e:
+                result = {"error": str(e), "status": 500}
+        return index, result
+
+    async def generate_many(indices: List[int]):
+        if len(indices) == 1:
+            return [await generate(indices[0], targets[indices[0]])]
+        async with semaphore:
+            try:
+                contents = await generate_pack([targets[i]["title"] for i in indices], topic, document_type,
+                                               bypass_cache=request.regenerate)
+            except Exception as e:
+                print(f"Packed generation failed, falling back to single sections: {e}")
+                contents = [None] * len(indices)
+        results = [(i, {"content": c, "status": 200}) for i, c in zip(indices, contents) if c is not None]
+        missing = [i for i, c in zip(indices, contents) if c is None]
+        results.extend(await asyncio.gather(*(generate(i, targets[i]) for i in missing)))
+        return results
+
+    async def produce(queue: "asyncio.Queue[Optional[str]]"):
+        # Runs apart from the response so a disconnect does not throw away paid-for answers.
+        generated = {}
+        try:
+            queue.put_nowait(sse_event({"total": len(targets), "concurrency": limit, "packs": len(packs)}, event="start"))
+            tasks = [asyncio.create_task(generate_many(pack)) for pack in packs]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    for index, result in await next_done:
+                        target = targets[index]
+                        if result.get("status") == 200:
+                            generated[index] = result["content"]
+                            queue.put_nowait(sse_event({"index": index, "order_index": target["order_index"], "title": target["title"],
+                                                      "content": result["content"]}, event="section"))
+                        else:
+                            queue.put_nowait(sse_event({"index": index, "order_index": target["order_index"], "title": target["title"],
+                                                      "error": result.get("error", "AI content generation failed")}, event="section_error"))
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            if sb is not None:
+                try:
+                    if "id" in targets[0]:
+                        saved = await _save_existing(sb, request.projectId, targets, generated)
+                    else:
+                        saved = await _save_new(sb, request.projectId, targets, generated)
+                    if saved is not None:
+                        export_cache.invalidate_project(request.projectId)
+                        queue.put_nowait(sse_event(saved, event="saved"))
+                except Exception as e:
+                    print(f"Bulk section save failed: {e}")
+                    queue.put_nowait(sse_event({"error": "Failed to save sections"}, event="error"))
+
+            queue.put_nowait(sse_event({"completed": len(generated), "failed": len(targets) - len(generated)}, event="done"))
+        except Exception as e:
+            print(f"Document generation failed: {e}")
+            queue.put_nowait(sse_event({"error": "Document generation failed"}, event="error"))
+        finally:
+            queue.put_nowait(None)
+
+    async def events():
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        producer = asyncio.create_task(produce(queue))
+        _producers.add(producer)
+        producer.add_done_callback(_producers.discard)
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            # With nothing to persist there is no reason to keep generating for a gone client.
+            if sb is None:
+                producer.cancel()
+
+    return sse_response(events())
@@ -1,18 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from typing import Optional
 from auth import verify_token
+from config import settings
 from services.ai_service import ai_service
-import json
-import re
+from services.disconnect import cancel_on_disconnect
+from services.outline_parser import OUTLINE_SCHEMA, parse_outline
+from services.speculation import speculation
 
 router = APIRouter()
 
 class OutlineRequest(BaseModel):
     topic: str
     documentType: str
+    regenerate: bool = False
+    # Pre-generate the first sections' content; None means SPECULATION_ENABLED
+    speculate: Optional[bool] = None
 
 @router.post("/generate-outline")
-async def generate_outline(request: OutlineRequest, user = Depends(verify_token)):
+async def generate_outline(request: OutlineRequest, http_request: Request, user = Depends(verify_token)):
     system_prompt = f"""You are an expert content strategist. Create a detailed outline for a {request.documentType} document.
 
 Format: Return ONLY a JSON array of section objects with 'title' and 'description' fields.
@@ -29,45 +35,22 @@ Requirements:
         {"role": "user", "content": f"Topic: {request.topic}"}
     ]
 
-    result = await ai_service.generate_completion(messages)
+    result = await cancel_on_disconnect(http_request, ai_service.generate_completion(
+        messages, cache=True, bypass_cache=request.regenerate,
+        response_schema=OUTLINE_SCHEMA, timeout=settings.OUTLINE_TIMEOUT))
     if result.get("status") != 200:
         raise HTTPException(status_code=result.get("status", 500), detail=result.get("error", "AI generation failed"))
 
-    content = result["content"]
-    final_outline = []
-
-    try:
-        json_match = re.search(r'\[.*\]', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            data = json.loads(json_str)
-            for item in data:
-                if isinstance(item, dict) and item.get("title"):
-                    final_outline.append({
-                        "title": item["title"], 
-                        "description": item.get("description", "")
-                    })
-    except Exception as e:
-        print(f"JSON Parse failed, switching to fallback: {e}")
-
-    if not final_outline:
-        titles = re.findall(r'"title":\s*"([^"]+)"', content)
-        descriptions = re.findall(r'"description":\s*"([^"]+)"', content)
-        
-        for i, title in enumerate(titles):
-            desc = descriptions[i] if i < len(descriptions) else ""
-            final_outline.append({"title": title, "description": desc})
-
-    if not final_outline:
-        lines = [l.strip() for l in content.split("\n") if l.strip()]
-        for l in lines:
-            if l in ['[', ']', '{', '}', '},', '],']:
-                continue
-            clean_l = l.strip('"').strip(',').strip()
-            if clean_l:
-                final_outline.append({"title": clean_l, "description": ""})
-
-    if not final_outline:
-        final_outline = [{"title": "Introduction", "description": "Please regenerate outline."}]
-
-    return {"outline": final_outline[:10]}
\ No newline at end of file
+    final_outline, _ = parse_outline(result["content"])
+    final_outline = final_outline[:10]
+    speculate = request.speculate if request.speculate is not None else settings.SPECULATION_ENABLED
+    if speculate:
+        speculation.start(user["user_id"], request.topic, [s.get("title") for s in final_outline], request.documentType)
+    else:
+        speculation.cancel(user["user_id"])
+    return {"outline": final_outline}
+
+@router.delete("/generate-outline/speculation")
+async def cancel_speculation(user = Depends(verify_token)):
+    """Drops pre-generated content, e.g. once the user starts editing the outline."""
+    return {"status": "cancelled", "dropped": speculation.cancel(user["user_id"])}
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from supabase_client import supabase_client
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from supabase_client import db
 from auth import verify_token
+from config import settings
+from services.export_cache import export_cache
+from services.http_cache import cached_json
 from pydantic import BaseModel
+from typing import Optional
+import base64
+import json
+import uuid
+from datetime import datetime
 
 router = APIRouter()
 
@@ -11,24 +19,69 @@ class CreateProjectPayload(BaseModel):
     topic: str
     ppt_template: str = "default"
 
-@router.get("/projects")
-def get_projects(user = Depends(verify_token)):
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"])
+PROJECT_SUMMARY_COLUMNS = "id, title, document_type, topic, status, ppt_template, created_at, updated_at"
+
+
+def _encode_cursor(project: dict) -> str:
+    raw = json.dumps([project["updated_at"], project["id"]])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
 
-    response = sb.table("projects").select("*").eq("user_id", user["user_id"]).order("updated_at", desc=True).execute()
-    
-    if getattr(response, "status_code", None) not in (200, 201, 0, None):
-        pass
-    return {"projects": response.data or []}
+
+def _decode_cursor(cursor: str):
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # Both values go into a PostgREST filter string, so only accept well-formed ones.
+        datetime.fromisoformat(updated_at)
+        return updated_at, str(uuid.UUID(project_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/projects")
+async def get_projects(
+    user = Depends(verify_token),
+    limit: Optional[int] = Query(None, ge=1, le=settings.PROJECTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Lists project summaries, newest first.
+
+    Without `limit` or `cursor` every project is returned. With either, the
+    list is paged by keyset (PROJECTS_PAGE_SIZE by default): pass the
+    returned `next_cursor` back as `cursor` for the next page.
+    """
+    sb = db.postgrest(user["token"])
+    paged = limit is not None or cursor is not None
+    if paged and limit is None:
+        limit = settings.PROJECTS_PAGE_SIZE
+
+    query = (
+        sb.table("projects")
+        .select(PROJECT_SUMMARY_COLUMNS)
+        .eq("user_id", user["user_id"])
+        .order("updated_at", desc=True)
+        .order("id", desc=True)
+    )
+    if paged:
+        query = query.limit(limit + 1)
+    if cursor:
+        updated_at, project_id = _decode_cursor(cursor)
+        query = query.or_(f'updated_at.lt."{updated_at}",and(updated_at.eq."{updated_at}",id.lt.{project_id})')
+
+    response = await db.execute(query, "projects.list")
+    projects = response.data or []
+
+    next_cursor = None
+    if paged and len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = _encode_cursor(projects[-1])
+
+    return cached_json({"projects": projects, "next_cursor": next_cursor}, if_none_match)
 
 
 @router.post("/projects/create")
-def create_project(payload: CreateProjectPayload, user = Depends(verify_token)):
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"]) 
+async def create_project(payload: CreateProjectPayload, user = Depends(verify_token)):
+    sb = db.postgrest(user["token"])
 
     project_data = {
         "title": payload.title,
@@ -39,9 +92,10 @@ def create_project(payload: CreateProjectPayload, user = Depends(verify_token)):
         "ppt_template": payload.ppt_template
     }
     
-    result = sb.table("projects").insert(project_data).execute()
-    
-    if getattr(result, "status_code", None) not in (200, 201, None, 0):
+    try:
+        result = await db.execute(sb.table("projects").insert(project_data), "projects.create")
+    except Exception as e:
+        print(f"Create project failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to create project")
     
     project = (result.data[0] if isinstance(result.data, list) and len(result.data) > 0 else result.data)
@@ -50,42 +104,46 @@ def create_project(payload: CreateProjectPayload, user = Depends(verify_token)):
 
 
 @router.get("/projects/{project_id}")
-def get_project(project_id: str, user = Depends(verify_token)):
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"])
-
-    res = sb.table("projects").select("*, sections(*)").eq("id", project_id).single().execute()
+async def get_project(project_id: str, user = Depends(verify_token), if_none_match: Optional[str] = Header(None)):
+    sb = db.postgrest(user["token"])
+
+    # Project, ordered sections and their feedback in a single PostgREST request.
+    query = (
+        sb.table("projects")
+        .select("*, sections(*, feedback(*))")
+        .eq("id", project_id)
+        .order("order_index", foreign_table="sections")
+        .single()
+    )
+    try:
+        res = await db.execute(query, "projects.get")
+    except Exception:
+        raise HTTPException(status_code=404, detail="Project not found")
     
     if not res.data:
         raise HTTPException(status_code=404, detail="Project not found")
     
     project = res.data
 
-    if project.get("sections"):
-        project["sections"].sort(key=lambda x: x.get("order_index", 0))
-
-    section_ids = [s["id"] for s in project.get("sections", [])]
     feedback_data = []
-    
-    if section_ids:
-        fb_res = sb.table("feedback").select("*").in_("section_id", section_ids).execute()
-        feedback_data = fb_res.data if fb_res.data else []
+    for section in project.get("sections") or []:
+        feedback_data.extend(section.pop("feedback", None) or [])
 
-    return {
+    return cached_json({
         "project": project,
         "feedback": feedback_data
-    }
+    }, if_none_match)
 
 @router.delete("/projects/{project_id}")
-def delete_project(project_id: str, user = Depends(verify_token)):
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"])
+async def delete_project(project_id: str, user = Depends(verify_token)):
+    sb = db.postgrest(user["token"])
 
-    res = sb.table("projects").delete().eq("id", project_id).execute()
-    
-    if getattr(res, "status_code", None) not in (200, 204, None, 0):
-         raise HTTPException(status_code=500, detail="Failed to delete project")
+    try:
+        await db.execute(sb.table("projects").delete().eq("id", project_id), "projects.delete")
+    except Exception as e:
+        print(f"Delete project failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to delete project")
+
+    export_cache.invalidate_project(project_id, forget_sections=True)
 
-    return {"status": "deleted", "id": project_id}
\ No newline at end of file
+    return {"status": "deleted", "id": project_id}
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from auth import verify_token
+from config import settings
 from services.ai_service import ai_service
+from services.disconnect import cancel_on_disconnect
+from services.gemini_scheduler import Priority
+from services.streaming import completion_events, sse_response
 
 router = APIRouter()
 
@@ -10,8 +14,7 @@ class RefineRequest(BaseModel):
     prompt: str
     documentType: str
 
-@router.post("/refine-content")
-async def refine_content(request: RefineRequest, user = Depends(verify_token)):
+def build_messages(request: RefineRequest):
     system_prompt = f"""You are a professional content editor for {request.documentType} documents.
 
 Current content:
@@ -20,11 +23,20 @@ Current content:
 User request: {request.prompt}
 
 Provide the refined version maintaining the original structure and style."""
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": request.prompt}
     ]
-    result = await ai_service.generate_completion(messages)
+
+@router.post("/refine-content")
+async def refine_content(request: RefineRequest, http_request: Request, user = Depends(verify_token)):
+    result = await cancel_on_disconnect(http_request, ai_service.generate_completion(
+        build_messages(request), cache=settings.LLM_CACHE_REFINE,
+        priority=Priority.INTERACTIVE, timeout=settings.REFINE_TIMEOUT))
     if result.get("status") != 200:
         raise HTTPException(status_code=result.get("status", 500), detail=result.get("error", "Content refinement failed"))
     return {"content": result["content"]}
+
+@router.post("/refine-content/stream")
+async def refine_content_stream(request: RefineRequest, user = Depends(verify_token)):
+    return sse_response(completion_events(ai_service.stream_completion(build_messages(request), timeout=settings.STREAM_TIMEOUT)))
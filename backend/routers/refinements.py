@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from supabase_client import supabase_client
+from services.write_buffer import refinement_buffer, BufferFull, WriteFailed
 from auth import verify_token
 
 router = APIRouter()
@@ -11,18 +11,16 @@ class RefinementPayload(BaseModel):
     result: str
 
 @router.post("/refinements/create")
-def add_refinement(payload: RefinementPayload, user = Depends(verify_token)):
-    sb = supabase_client()
-    
-    sb.postgrest.auth(user["token"]) 
-
+async def add_refinement(payload: RefinementPayload, user = Depends(verify_token)):
     data = {
         "section_id": payload.section_id,
         "prompt": payload.prompt,
         "result": payload.result,
     }
-    res = sb.table("refinements").insert(data).execute()
-    
-    if getattr(res, "status_code", None) not in (200, 201, None, 0):
-        raise HTTPException(status_code=500, detail="Failed to save refinement")
-    return {"status": "ok"}
\ No newline at end of file
+    try:
+        await refinement_buffer.add(user["token"], data)
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except WriteFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"status": "ok"}
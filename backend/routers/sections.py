@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from supabase_client import supabase_client
+from pydantic import BaseModel, Field
+from supabase_client import db
 from auth import verify_token
-from typing import Optional
+from config import settings
+from services.body_limit import limited_body
+from services.export_cache import export_cache
+from services.speculation import speculation
+from typing import List, Optional
+from uuid import UUID
 
 router = APIRouter()
 
@@ -14,22 +19,39 @@ class UpdateSectionPayload(BaseModel):
     content: Optional[str] = None
     image_url: Optional[str] = None
 
+class SectionChange(BaseModel):
+    id: UUID
+    version: int
+    content: Optional[str] = Field(None, max_length=settings.SECTIONS_MAX_CONTENT_CHARS)
+    image_url: Optional[str] = None
+    order_index: Optional[int] = None
+
+class BatchSectionsPayload(BaseModel):
+    project_id: UUID
+    changes: List[SectionChange] = Field(max_length=settings.SECTIONS_BATCH_MAX_ROWS)
+
 @router.post("/sections/add")
-def add_sections(payload: AddSectionsPayload, user = Depends(verify_token)):
-    sb = supabase_client()
-    sb.postgrest.auth(user["token"])
+async def add_sections(payload: AddSectionsPayload, user = Depends(verify_token)):
+    sb = db.postgrest(user["token"])
     
     sections = payload.sections
-    res = sb.table("sections").insert(sections).execute()
-    if getattr(res, "status_code", None) not in (200, 201, None, 0):
+    try:
+        await db.execute(sb.table("sections").insert(sections), "sections.add")
+    except Exception as e:
+        print(f"Add sections failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to add sections")
+
+    for project_id in {s.get("project_id") for s in sections if isinstance(s, dict)}:
+        if project_id:
+            export_cache.invalidate_project(project_id)
+    # Sections are added once the outline is final; titles edited since lose their speculation.
+    speculation.retain(user["user_id"], [s.get("title") for s in sections if isinstance(s, dict)])
     return {"status": "success"}
 
 
 @router.post("/sections/update")
-def update_section(payload: UpdateSectionPayload, user = Depends(verify_token)):
-    sb = supabase_client()
-    sb.postgrest.auth(user["token"]) 
+async def update_section(payload: UpdateSectionPayload, user = Depends(verify_token)):
+    sb = db.postgrest(user["token"])
 
     data = {}
     if payload.content is not None:
@@ -40,9 +62,56 @@ def update_section(payload: UpdateSectionPayload, user = Depends(verify_token)):
     if not data:
         return {"status": "no changes"}
     
-    res = sb.table("sections").update(data).eq("id", payload.section_id).execute()
-
-    if getattr(res, "status_code", None) not in (200, 201, None, 0):
+    try:
+        await db.execute(sb.table("sections").update(data).eq("id", payload.section_id), "sections.update")
+    except Exception as e:
+        print(f"Update section failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to update section")
+
+    export_cache.invalidate_section(payload.section_id)
     
-    return {"status": "updated"}
\ No newline at end of file
+    return {"status": "updated"}
+
+
+@router.post("/sections/batch")
+async def batch_update_sections(
+    # Dependencies run in order: callers are authenticated before their body is read.
+    user = Depends(verify_token),
+    payload: BatchSectionsPayload = Depends(limited_body(BatchSectionsPayload, settings.SECTIONS_BATCH_MAX_BYTES)),
+):
+    """Applies many content/image/order changes to one project in a single round trip.
+
+    Every change carries the `version` the client last read. Rows edited by
+    someone else in the meantime come back as "conflict" with their current
+    version instead of being overwritten. The body is capped at
+    SECTIONS_BATCH_MAX_BYTES while it is read, before it is parsed.
+    """
+    if not payload.changes:
+        return {"results": [], "updated": 0, "conflicts": 0}
+
+    changes = [change.model_dump(mode="json", exclude_unset=True) for change in payload.changes]
+    project_id = str(payload.project_id)
+
+    sb = db.postgrest(user["token"])
+    try:
+        res = await db.execute(
+            sb.rpc("batch_update_sections", {"p_project_id": project_id, "p_changes": changes}),
+            "sections.batch",
+        )
+    except Exception as e:
+        print(f"Batch section update failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to update sections")
+
+    results = [
+        {"id": row["section_id"], "status": row["result"], "version": row["current_version"]}
+        for row in res.data or []
+    ]
+    updated = sum(1 for r in results if r["status"] == "updated")
+    if updated:
+        export_cache.invalidate_project(project_id)
+
+    return {
+        "results": results,
+        "updated": updated,
+        "conflicts": sum(1 for r in results if r["status"] == "conflict"),
+    }
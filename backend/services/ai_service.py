@@ -1,15 +1,136 @@
+import asyncio
+import json
+import time
 import httpx
-from typing import List, Dict, Any
+from contextlib import AsyncExitStack, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Union
 from config import settings
+from services import metrics
+from services.gemini_scheduler import GeminiScheduler, Priority, Ticket
+from services.llm_cache import llm_cache
+from services.single_flight import SingleFlight
+
+FALLBACK_CONTENT = "Error: The AI could not generate content for this section. Please try refining the title or regenerating."
+RETRYABLE_STATUS = (429, 503)
 
 class AIService:
     def __init__(self):
         self.api_key = settings.GEMINI_API_KEY
         self.model = settings.GEMINI_MODEL
-        self.url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        base_url = f"{settings.GEMINI_BASE_URL.rstrip('/')}/models/{self.model}"
+        self.url = f"{base_url}:generateContent"
+        self.stream_url = f"{base_url}:streamGenerateContent"
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.single_flight = SingleFlight()
+        self._tickets: Dict[str, Ticket] = {}
+        self.scheduler = GeminiScheduler(
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            min_concurrency=settings.GEMINI_MIN_CONCURRENCY,
+            rpm=settings.GEMINI_RPM,
+            tpm=settings.GEMINI_TPM,
+            retry_base_delay=settings.GEMINI_RETRY_BASE_DELAY,
+            retry_max_delay=settings.GEMINI_RETRY_MAX_DELAY,
+        )
+        self.cancelled = 0
+        self.deadline_exceeded = 0
+
+    async def start(self):
+        """Creates the process-wide Gemini client. Called from the app lifespan."""
+        if self._client is not None:
+            return
+        http2 = settings.GEMINI_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("GEMINI_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+                http2 = False
+        self._client = httpx.AsyncClient(
+            timeout=settings.GEMINI_TIMEOUT,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Lazily created for callers running outside the app lifespan (scripts, shells).
+        if self._client is None:
+            await self.start()
+        return self._client
 
-    async def generate_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 4000) -> Dict[str, Any]:
-        # Build prompt
+    def stats(self) -> Dict[str, Any]:
+        return {**self.scheduler.stats(), "cancelled": self.cancelled, "deadline_exceeded": self.deadline_exceeded}
+
+    def _deadline_error(self, timeout: float) -> Dict[str, Any]:
+        self.deadline_exceeded += 1
+        return {"error": f"AI generation did not finish within {timeout:g}s", "status": 504}
+
+    @staticmethod
+    def _retry_after(resp: httpx.Response, body: str) -> Optional[float]:
+        """Reads the server's retry hint from Retry-After or Gemini's RetryInfo detail."""
+        header = resp.headers.get("retry-after")
+        if header:
+            try:
+                return max(0.0, float(header))
+            except ValueError:
+                try:
+                    return max(0.0, (parsedate_to_datetime(header) - datetime.now(timezone.utc)).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+        try:
+            data = json.loads(body)
+            if isinstance(data, list) and data:
+                data = data[0]
+            for detail in data.get("error", {}).get("details", []):
+                delay = detail.get("retryDelay")
+                if isinstance(delay, str) and delay.endswith("s"):
+                    return float(delay[:-1])
+        except (ValueError, AttributeError):
+            pass
+        return None
+
+    def _retry_delay(self, attempt: int, resp: httpx.Response, body: str) -> Optional[float]:
+        """Backoff before the next attempt, or None if this throttled call should fail now."""
+        self.scheduler.on_throttle()
+        if attempt >= settings.GEMINI_MAX_RETRIES:
+            return None
+        delay = self.scheduler.retry_delay(attempt, self._retry_after(resp, body))
+        if delay is not None:
+            self.scheduler.retries += 1
+        return delay
+
+    def _record_usage(self, data: Dict[str, Any], estimated: int):
+        usage = data.get("usageMetadata") if isinstance(data, dict) else None
+        if usage:
+            self.scheduler.record_usage(estimated, usage.get("promptTokenCount"))
+            metrics.gemini_tokens.inc("prompt", amount=usage.get("promptTokenCount") or 0)
+            metrics.gemini_tokens.inc("candidates", amount=usage.get("candidatesTokenCount") or 0)
+
+    @staticmethod
+    @asynccontextmanager
+    async def _timed(kind: str):
+        """Records one upstream attempt; the caller fills in call["status"]."""
+        call = {"status": "error"}
+        started = time.perf_counter()
+        try:
+            yield call
+        finally:
+            metrics.gemini_latency.observe(time.perf_counter() - started, kind)
+            metrics.gemini_requests.inc(kind, str(call["status"]))
+
+    @staticmethod
+    def _build_prompt(messages: List[Dict[str, str]]) -> str:
         prompt_lines = []
         for m in messages:
             role = m.get("role", "user")
@@ -20,8 +141,11 @@ class AIService:
                 prompt_lines.append(f"USER: {text}")
             else:
                 prompt_lines.append(text)
-        prompt_text = "\n\n".join(prompt_lines)
+        return "\n\n".join(prompt_lines)
 
+    @staticmethod
+    def _build_payload(prompt_text: str, temperature: float, max_tokens: int,
+                       response_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         payload = {
             "contents": [{
                 "parts": [{"text": prompt_text}]
@@ -31,39 +155,241 @@ class AIService:
                 "maxOutputTokens": max_tokens
             }
         }
+        if response_schema is not None:
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+            payload["generationConfig"]["responseSchema"] = response_schema
+        return payload
+
+    @staticmethod
+    def _api_error(status_code: int, body: str) -> Dict[str, Any]:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, list) and data:
+            data = data[0]
+        err = data.get("error", {}).get("message") if isinstance(data, dict) else body
+        print(f"Gemini API Error: {err}")
+        return {"error": f"Google API error: {err}", "status": status_code}
+
+    @staticmethod
+    def _candidate_text(data: Dict[str, Any]) -> Optional[str]:
+        content = None
+        try:
+            if "candidates" in data and len(data["candidates"]) > 0:
+                candidate = data["candidates"][0]
 
+                finish_reason = candidate.get("finishReason")
+                if finish_reason:
+                    metrics.gemini_finish_reasons.inc(finish_reason)
+                if finish_reason and finish_reason != "STOP":
+                    print(f"Warning: Generation stopped due to {finish_reason}")
+
+                if "content" in candidate and "parts" in candidate["content"]:
+                    content = candidate["content"]["parts"][0]["text"]
+        except Exception as e:
+            print(f"Parsing Error: {e}")
+        return content
+
+    async def generate_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 4000,
+                                  cache: bool = False, bypass_cache: bool = False,
+                                  response_schema: Optional[Dict[str, Any]] = None,
+                                  priority: Priority = Priority.NORMAL,
+                                  timeout: Optional[float] = None,
+                                  cacheable: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+        """Runs one Gemini completion.
+
+        With `cache` the answer is served from / stored in llm_cache;
+        `bypass_cache` skips the lookup (e.g. "regenerate") but still stores
+        the fresh answer. `cacheable`, when given, must accept an answer
+        before it is stored, so truncated or malformed replies are not kept.
+        Passing a `response_schema` (Gemini's OpenAPI subset) switches the
+        call to structured JSON output. `priority`
+        decides the call's place in the scheduler queue. `timeout` is a
+        deadline for the whole call, queueing and retries included; when it
+        passes, the caller gets a 504 result and the upstream request is
+        dropped unless another caller is still waiting on it. Fresh answers
+        carry Gemini's usageMetadata under "usage"; cached ones do not.
+        """
+        prompt_text = self._build_prompt(messages)
+        key = llm_cache.make_key(prompt_text, self.model, temperature, max_tokens, response_schema)
+        use_cache = cache and settings.LLM_CACHE_ENABLED
+        if use_cache and not bypass_cache:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                return {"content": cached, "status": 200, "cached": True}
+
+        # Identical prompts already in flight share one upstream call, queued at
+        # the most urgent priority among the callers waiting on it.
+        ticket = self._tickets.get(key)
+        if ticket is None:
+            ticket = self._tickets[key] = Ticket(priority)
+        else:
+            self.scheduler.promote(ticket, priority)
+        try:
+            shared = self.single_flight.do(key, lambda: self._shared_completion(key, ticket, prompt_text, temperature, max_tokens, response_schema))
+            result = dict(await asyncio.wait_for(shared, timeout))
+        except asyncio.TimeoutError:
+            return self._deadline_error(timeout)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            # The shared call drops its ticket when it ends, but a caller cancelled
+            # before that call ever started has to drop it here.
+            if self._tickets.get(key) is ticket and not self.single_flight.active(key):
+                del self._tickets[key]
+        if (use_cache and result.get("status") == 200 and result["content"] != FALLBACK_CONTENT
+                and (cacheable is None or cacheable(result["content"]))):
+            await llm_cache.set(key, result["content"])
+        return result
+
+    async def _shared_completion(self, key: str, ticket: Ticket, prompt_text: str, temperature: float, max_tokens: int,
+                                 response_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            return await self._request_completion(prompt_text, temperature, max_tokens, response_schema, ticket)
+        finally:
+            if self._tickets.get(key) is ticket:
+                del self._tickets[key]
+
+    async def _request_completion(self, prompt_text: str, temperature: float, max_tokens: int,
+                                  response_schema: Optional[Dict[str, Any]] = None,
+                                  priority: Union[Priority, Ticket] = Priority.NORMAL) -> Dict[str, Any]:
+        payload = self._build_payload(prompt_text, temperature, max_tokens, response_schema)
         headers = {"Content-Type": "application/json"}
+        estimated = self.scheduler.estimate_tokens(prompt_text)
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.post(f"{self.url}?key={self.api_key}", json=payload, headers=headers)
-                data = resp.json()
+            client = await self._get_client()
+            attempt = 0
+            while True:
+                async with self.scheduler.slot(priority, estimated), self._timed("generate") as call:
+                    resp = await client.post(f"{self.url}?key={self.api_key}", json=payload, headers=headers)
+                    call["status"] = resp.status_code
+                if resp.status_code not in RETRYABLE_STATUS:
+                    break
+                delay = self._retry_delay(attempt, resp, resp.text)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                attempt += 1
 
-                if resp.status_code != 200:
-                    err = data.get("error", {}).get("message") if isinstance(data, dict) else resp.text
-                    print(f"Gemini API Error: {err}")
-                    return {"error": f"Google API error: {err}", "status": resp.status_code}
+            if resp.status_code != 200:
+                return self._api_error(resp.status_code, resp.text)
 
-                content = None
-                try:
-                    if "candidates" in data and len(data["candidates"]) > 0:
-                        candidate = data["candidates"][0]
-                        
-                        if candidate.get("finishReason") != "STOP":
-                            print(f"Warning: Generation stopped due to {candidate.get('finishReason')}")
-
-                        if "content" in candidate and "parts" in candidate["content"]:
-                            content = candidate["content"]["parts"][0]["text"]
-                except Exception as e:
-                    print(f"Parsing Error: {e}")
-                    pass
+            self.scheduler.on_success()
+            data = resp.json()
+            self._record_usage(data, estimated)
+            content = self._candidate_text(data)
 
-                if not content:
-                    print(f"Raw Response (Empty content): {data}")
-                    content = "Error: The AI could not generate content for this section. Please try refining the title or regenerating."
+            if not content:
+                print(f"Raw Response (Empty content): {data}")
+                content = FALLBACK_CONTENT
 
-                return {"content": content, "status": 200}
+            return {"content": content, "status": 200, "usage": data.get("usageMetadata") or {}}
         except Exception as e:
             return {"error": str(e), "status": 500}
 
-ai_service = AIService()
\ No newline at end of file
+    async def stream_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 4000,
+                                priority: Priority = Priority.INTERACTIVE,
+                                timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields {"content": chunk} dicts as Gemini produces text.
+
+        Errors are yielded as a final {"error", "status"} dict, mirroring
+        generate_completion, and an empty answer yields the usual fallback text.
+        Throttled requests are retried only before any text has been sent.
+        Past `timeout` seconds the stream ends with a 504 error, also while it
+        is still waiting for a scheduler slot or for Gemini's next line; the
+        caller going away closes the upstream request.
+        """
+        prompt_text = self._build_prompt(messages)
+        payload = self._build_payload(prompt_text, temperature, max_tokens)
+        headers = {"Content-Type": "application/json"}
+        estimated = self.scheduler.estimate_tokens(prompt_text)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        produced = False
+
+        def within_deadline(awaitable):
+            # Bounds one wait (a scheduler slot, the response headers, the next line) by what is left.
+            return asyncio.wait_for(awaitable, None if deadline is None else max(0.0, deadline - loop.time()))
+
+        try:
+            client = await self._get_client()
+            attempt = 0
+            while True:
+                delay = None
+                async with AsyncExitStack() as stack:
+                    try:
+                        await within_deadline(stack.enter_async_context(self.scheduler.slot(priority, estimated)))
+                        call = await stack.enter_async_context(self._timed("stream"))
+                        resp = await within_deadline(stack.enter_async_context(
+                            client.stream("POST", f"{self.stream_url}?alt=sse&key={self.api_key}", json=payload, headers=headers)))
+                    except asyncio.TimeoutError:
+                        yield self._deadline_error(timeout)
+                        return
+                    call["status"] = resp.status_code
+                    if resp.status_code != 200:
+                        body = (await resp.aread()).decode("utf-8", errors="replace")
+                        if resp.status_code in RETRYABLE_STATUS:
+                            delay = self._retry_delay(attempt, resp, body)
+                        if delay is None:
+                            yield self._api_error(resp.status_code, body)
+                            return
+                    else:
+                        self.scheduler.on_success()
+                        usage = None
+                        lines = resp.aiter_lines()
+                        while True:
+                            try:
+                                line = await within_deadline(lines.__anext__())
+                            except StopAsyncIteration:
+                                break
+                            except asyncio.TimeoutError:
+                                yield self._deadline_error(timeout)
+                                return
+                            if not line.startswith("data:"):
+                                continue
+                            try:
+                                data = json.loads(line[len("data:"):].strip())
+                            except ValueError:
+                                continue
+                            if isinstance(data, dict) and "error" in data:
+                                yield self._api_error(data["error"].get("code", 500), json.dumps(data))
+                                return
+                            if isinstance(data, dict) and data.get("usageMetadata"):
+                                usage = data
+                            text = self._candidate_text(data)
+                            if deadline is not None and loop.time() > deadline:
+                                yield self._deadline_error(timeout)
+                                return
+                            if text:
+                                produced = True
+                                try:
+                                    yield {"content": text}
+                                except GeneratorExit:
+                                    # The consumer stopped reading mid-answer (client went away).
+                                    self.cancelled += 1
+                                    raise
+                        # Each chunk carries running totals, so the last one is the real count.
+                        if usage is not None:
+                            self._record_usage(usage, estimated)
+                if delay is None:
+                    break
+                if deadline is not None and loop.time() + delay > deadline:
+                    yield self._deadline_error(timeout)
+                    return
+                await asyncio.sleep(delay)
+                attempt += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            yield {"error": str(e), "status": 500}
+            return
+
+        if not produced:
+            print("Stream finished without content")
+            yield {"content": FALLBACK_CONTENT}
+
+ai_service = AIService()
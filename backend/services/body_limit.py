@@ -0,0 +1,33 @@
+from typing import Callable, Type, TypeVar
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def limited_body(model: Type[M], max_bytes: int) -> Callable[[Request], M]:
+    """A dependency that parses the JSON body into `model`, reading at most `max_bytes`.
+
+    Use it instead of a plain body parameter: FastAPI reads and validates
+    those in full before any dependency or handler runs, and chunked
+    uploads carry no Content-Length to check up front.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+
+    async def dependency(request: Request) -> M:
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise too_large
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large
+            chunks.append(chunk)
+        try:
+            return model.model_validate_json(b"".join(chunks))
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False), body=None)
+
+    return dependency
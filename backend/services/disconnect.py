@@ -0,0 +1,31 @@
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import HTTPException, Request
+from config import settings
+
+T = TypeVar("T")
+
+# nginx's "client closed request"; nobody reads this response.
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Awaits `awaitable`, cancelling it as soon as the client goes away.
+
+    Streaming responses are already cancelled by Starlette on disconnect;
+    this covers the plain JSON endpoints, whose handlers otherwise run to
+    completion for a client that is no longer listening.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -1,25 +1,110 @@
-from docx import Document
-from pptx import Presentation
-from pptx.util import Inches, Pt
+import importlib
 import io
-from docx.shared import Inches
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import httpx
 import re
-import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Optional, Tuple
+from config import settings
+from services import metrics
+from services.image_cache import image_cache
+from services.template_store import template_store
+from services.section_cache import section_key
+
+# python-docx and python-pptx are imported inside the render methods so that
+# importing the app stays fast; preload() pulls them in ahead of time.
+RENDER_MODULES = ("lxml.etree", "docx", "docx.oxml", "docx.shared", "pptx", "pptx.oxml", "pptx.util")
 
 
 class DocumentService:
 
+    _http: Optional[httpx.Client] = None
+    _http_lock = threading.Lock()
+
+    @classmethod
+    def _http_client(cls) -> httpx.Client:
+        with cls._http_lock:
+            if cls._http is None:
+                cls._http = httpx.Client(
+                    timeout=settings.IMAGE_FETCH_TIMEOUT,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=settings.IMAGE_FETCH_CONCURRENCY),
+                )
+            return cls._http
+
+    @staticmethod
+    def preload():
+        for name in RENDER_MODULES:
+            importlib.import_module(name)
+
+    @classmethod
+    def close(cls):
+        with cls._http_lock:
+            if cls._http is not None:
+                cls._http.close()
+                cls._http = None
+
+    @staticmethod
+    def fetch_image(url: str) -> Optional[bytes]:
+        cached = image_cache.get(url)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        data, result = DocumentService._download(url)
+        metrics.image_fetch_latency.observe(time.perf_counter() - started)
+        metrics.image_fetches.inc(result)
+        if data is not None:
+            image_cache.put(url, data)
+        return data
+
     @staticmethod
-    def _get_image_stream(url: str):
+    def _download(url: str) -> Tuple[Optional[bytes], str]:
         try:
-            with httpx.Client() as client:
-                resp = client.get(url)
-                if resp.status_code == 200:
-                    return io.BytesIO(resp.content)
+            with DocumentService._http_client().stream("GET", url) as resp:
+                if resp.status_code != 200:
+                    print(f"Failed to download image: HTTP {resp.status_code}")
+                    return None, "http_error"
+                declared = resp.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > settings.IMAGE_MAX_BYTES:
+                    print(f"Skipping image over {settings.IMAGE_MAX_BYTES} bytes: {url}")
+                    return None, "too_large"
+                chunks, size = [], 0
+                for chunk in resp.iter_bytes():
+                    size += len(chunk)
+                    if size > settings.IMAGE_MAX_BYTES:
+                        print(f"Skipping image over {settings.IMAGE_MAX_BYTES} bytes: {url}")
+                        return None, "too_large"
+                    chunks.append(chunk)
         except Exception as e:
             print(f"Failed to download image: {e}")
-        return None
+            return None, "error"
+        return b"".join(chunks), "ok"
+
+    @staticmethod
+    def prefetch_images(sections: list) -> Dict[str, bytes]:
+        """Downloads every distinct section image concurrently before rendering starts."""
+        urls = list(dict.fromkeys(s["image_url"] for s in sections if s.get("image_url")))
+        if not urls:
+            return {}
+        workers = max(1, min(settings.IMAGE_FETCH_CONCURRENCY, len(urls)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(DocumentService.fetch_image, urls)
+        return {url: data for url, data in zip(urls, results) if data is not None}
+
+    @staticmethod
+    def spool() -> BinaryIO:
+        """An output file that stays in memory up to EXPORT_SPOOL_MAX_MEMORY and then moves to disk."""
+        return tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_MEMORY, dir=settings.EXPORT_SPOOL_DIR or None)
+
+    @staticmethod
+    def _get_image_stream(url: str, images: Dict[str, bytes]):
+        data = images.get(url)
+        if data is None:
+            return None
+        return io.BytesIO(data)
 
     @staticmethod
     def _clean_text(text: str):
@@ -29,23 +114,47 @@ class DocumentService:
         return clean.strip()
 
     @staticmethod
-    def generate_word(title: str, sections: list) -> bytes:
+    def generate_word(title: str, sections: list, on_progress=None, images: Optional[Dict[str, bytes]] = None,
+                      fragments: Optional[Dict[str, bytes]] = None, out: Optional[BinaryIO] = None) -> BinaryIO:
+        """Renders a DOCX into `out` (a new spool() by default) and returns it rewound.
+        When `fragments` is given, section text is reused from it by section_key()
+        and newly rendered sections are added to it."""
+        from docx import Document
+        from docx.oxml import OxmlElement, parse_xml
+        from docx.shared import Inches
+        from lxml import etree
+        if images is None:
+            images = DocumentService.prefetch_images(sections)
         doc = Document()
+        body = doc.element.body
         #Title
         doc.add_heading(title, 0)
-        for section in sections:
-            #Clean title
-            clean_title = DocumentService._clean_text(section.get("title", ""))
-            doc.add_heading(clean_title, level=1)
-            
-            if section.get("content"):
-                #Clean content
-                clean_content = DocumentService._clean_text(section.get("content", ""))
-                doc.add_paragraph(clean_content)
+        for index, section in enumerate(sections):
+            key = section_key("word", None, section) if fragments is not None else None
+            cached = fragments.get(key) if key else None
+            if cached is not None:
+                for element in list(parse_xml(cached)):
+                    body._insert_p(element)
+            else:
+                rendered_from = len(body) - 1
+                #Clean title
+                clean_title = DocumentService._clean_text(section.get("title", ""))
+                doc.add_heading(clean_title, level=1)
+                
+                if section.get("content"):
+                    #Clean content
+                    clean_content = DocumentService._clean_text(section.get("content", ""))
+                    doc.add_paragraph(clean_content)
+
+                if key:
+                    wrapper = OxmlElement("w:body")
+                    for element in list(body)[rendered_from:len(body) - 1]:
+                        wrapper.append(copy.deepcopy(element))
+                    fragments[key] = etree.tostring(wrapper)
             
             image_url = section.get("image_url")
             if image_url:
-                image_stream = DocumentService._get_image_stream(image_url)
+                image_stream = DocumentService._get_image_stream(image_url, images)
                 if image_stream:
                     try:
                         doc.add_picture(image_stream, width=Inches(5))
@@ -54,28 +163,44 @@ class DocumentService:
                         doc.add_paragraph("[Image could not be loaded]")
 
             doc.add_paragraph()
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue()
+            if on_progress:
+                on_progress(index + 1, len(sections))
+        out = out if out is not None else DocumentService.spool()
+        doc.save(out)
+        out.seek(0)
+        return out
 
     @staticmethod
-    def generate_powerpoint(title: str, sections: list, template: str = "default") -> bytes:
-        base_path = os.path.dirname(os.path.dirname(__file__))
-        template_path = os.path.join(base_path, "templates", f"{template}.pptx")
+    def _fill_body(body, content: str):
+        from pptx.util import Pt
+        body.text_frame.clear() 
+        
+        content_raw = content.split("\n")
+        for line in content_raw:
+            line = line.strip()
+            if not line: continue
+            
+            clean_line = re.sub(r'^[-*•]\s*', '', DocumentService._clean_text(line))
+            
+            p = body.text_frame.add_paragraph()
+            p.text = clean_line
+            p.level = 0
 
+            p.font.size = Pt(12)  
+            p.font.name = "Arial" 
+            p.space_after = Pt(6) 
+
+    @staticmethod
+    def generate_powerpoint(title: str, sections: list, template: str = "default", on_progress=None, images: Optional[Dict[str, bytes]] = None,
+                            fragments: Optional[Dict[str, bytes]] = None, out: Optional[BinaryIO] = None) -> BinaryIO:
+        """Renders a PPTX into `out` like generate_word. `fragments` caches each slide's body text frame."""
+        from pptx.oxml import parse_xml as parse_pptx_xml
+        from pptx.util import Inches
+        from lxml import etree
+        if images is None:
+            images = DocumentService.prefetch_images(sections)
         #Load Presentation
-        if os.path.exists(template_path):
-            prs = Presentation(template_path)
-            for i in range(len(prs.slides) - 1, -1, -1):
-                rId = prs.slides._sldIdLst[i].rId
-                prs.part.drop_rel(rId)
-                del prs.slides._sldIdLst[i]
-        else:
-            print(f"Template not found at {template_path}, using blank.")
-            prs = Presentation() 
-            prs.slide_width = Inches(13.333)
-            prs.slide_height = Inches(7.5)
+        prs = template_store.open(template)
         
         #Title Slide
         title_layout = prs.slide_layouts[0]
@@ -85,7 +210,7 @@ class DocumentService:
             slide.shapes.title.text = title
             
         #Content Slides
-        for section in sections:
+        for index, section in enumerate(sections):
             slide_layout = prs.slide_layouts[1]
             slide = prs.slides.add_slide(slide_layout)
             
@@ -100,28 +225,22 @@ class DocumentService:
                 if len(slide.placeholders) > 1:
                     body = slide.placeholders[1]
                     if hasattr(body, "text_frame"):
-                        body.text_frame.clear() 
-                        
-                        content_raw = section["content"].split("\n")
-                        for line in content_raw:
-                            line = line.strip()
-                            if not line: continue
-                            
-                            clean_line = re.sub(r'^[-*•]\s*', '', DocumentService._clean_text(line))
-                            
-                            p = body.text_frame.add_paragraph()
-                            p.text = clean_line
-                            p.level = 0
-
-                            p.font.size = Pt(12)  
-                            p.font.name = "Arial" 
-                            p.space_after = Pt(6) 
+                        key = section_key("powerpoint", template, section) if fragments is not None else None
+                        cached = fragments.get(key) if key else None
+                        if cached is not None:
+                            current = body._element.txBody
+                            current.addprevious(parse_pptx_xml(cached))
+                            current.getparent().remove(current)
+                        else:
+                            DocumentService._fill_body(body, section["content"])
+                            if key:
+                                fragments[key] = etree.tostring(body._element.txBody)
                             
 
 
             image_url = section.get("image_url")
             if image_url:
-                image_stream = DocumentService._get_image_stream(image_url)
+                image_stream = DocumentService._get_image_stream(image_url, images)
                 if image_stream:
                     try:
 
@@ -131,9 +250,12 @@ class DocumentService:
                     except Exception:
                         pass
 
-        buffer = io.BytesIO()
-        prs.save(buffer)
-        buffer.seek(0)
-        return buffer.getvalue()
+            if on_progress:
+                on_progress(index + 1, len(sections))
+
+        out = out if out is not None else DocumentService.spool()
+        prs.save(out)
+        out.seek(0)
+        return out
 
 document_service = DocumentService()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple
+from config import settings
+
+
+def export_digest(project: dict, sections: list) -> str:
+    """Hash of everything that ends up in an exported file."""
+    raw = json.dumps([
+        project.get("id"),
+        project.get("title"),
+        project.get("document_type"),
+        project.get("ppt_template"),
+        [(s.get("id"), s.get("title"), s.get("content"), s.get("image_url"), s.get("order_index")) for s in sections],
+    ], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """Finished DOCX/PPTX files keyed by export_digest(), evicted LRU by bytes.
+
+    Files live in a private temp directory, so a hit streams from disk
+    without holding the document in memory. Entries for a project are
+    dropped when its sections are edited or the project is deleted, so
+    space isn't held by exports nobody can hit again.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._root: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[str, str, int, str, str]]" = OrderedDict()
+        self._section_projects: Dict[str, str] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _path(self, key: str) -> str:
+        if self._root is None:
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+            # One directory per process: the index is in memory and dies with it.
+            self._root = tempfile.mkdtemp(prefix="export-cache-", dir=self.directory or None)
+        return os.path.join(self._root, key)
+
+    def close(self):
+        with self._lock:
+            root, self._root = self._root, None
+            self._entries.clear()
+            self._section_projects.clear()
+            self._total = 0
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def size_of(self, key: str) -> Optional[int]:
+        entry = self._entries.get(key)
+        return entry[2] if entry else None
+
+    def get(self, key: str) -> Optional[Tuple[BinaryIO, str, str]]:
+        """Returns an open file for a cached export; the caller closes it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                try:
+                    f = open(entry[1], "rb")
+                except OSError:
+                    self._drop(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return f, entry[3], entry[4]
+
+    def put(self, key: str, project_id: str, section_ids: Iterable[str], src: BinaryIO, filename: str, mime: str):
+        """Copies `src` into the cache in chunks and rewinds it for the caller."""
+        size = src.seek(0, os.SEEK_END)
+        src.seek(0)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Export cache write failed: {e}")
+            return
+        finally:
+            src.seek(0)
+        with self._lock:
+            for section_id in section_ids:
+                self._section_projects[section_id] = project_id
+            self._total -= self._entries.pop(key, (None, None, 0))[2]
+            self._entries[key] = (project_id, path, size, filename, mime)
+            self._total += size
+            while self._total > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total -= entry[2]
+            try:
+                # Readers that already opened the file keep their handle.
+                os.remove(entry[1])
+            except OSError:
+                pass
+
+    def invalidate_project(self, project_id: str, forget_sections: bool = False):
+        with self._lock:
+            if forget_sections:
+                for section_id in [s for s, p in self._section_projects.items() if p == project_id]:
+                    del self._section_projects[section_id]
+            for key in [k for k, entry in self._entries.items() if entry[0] == project_id]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_section(self, section_id: str):
+        project_id = self._section_projects.pop(section_id, None)
+        if project_id:
+            self.invalidate_project(project_id)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+export_cache = ExportCache(settings.EXPORT_CACHE_DIR, settings.EXPORT_CACHE_MAX_BYTES)
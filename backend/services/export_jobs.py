@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+from config import settings
+
+# A render callable receives a progress callback and returns (open file, filename, mime).
+RenderFn = Callable[[Callable[[int, int], None]], Tuple[BinaryIO, str, str]]
+
+# Progress is written to disk at most this often while a job renders.
+PROGRESS_SAVE_INTERVAL = 0.5
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+class ExportLimitReached(Exception):
+    pass
+
+
+@dataclass
+class ExportJob:
+    id: str
+    user_id: str
+    project_id: str
+    render: Optional[RenderFn] = field(default=None, repr=False)
+    status: str = "queued"
+    completed: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    filename: Optional[str] = None
+    mime: Optional[str] = None
+    path: Optional[str] = None
+    size: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": round(self.completed / self.total, 3) if self.total else (1.0 if self.status == "done" else 0.0),
+            "completed": self.completed,
+            "total": self.total,
+            "error": self.error,
+            "filename": self.filename,
+            "size": self.size,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "render"}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "ExportJob":
+        return cls(**{f.name: record[f.name] for f in fields(cls) if f.name in record})
+
+
+class ExportJobManager:
+    """Runs document exports on a small worker pool fed by a bounded queue.
+
+    Rendering happens in worker threads so the event loop stays free;
+    finished artifacts are written to disk and removed after `ttl` seconds.
+    Each job's metadata is kept next to its artifact as `<id>.json`, so any
+    API process sharing `artifact_dir` can report on and serve a job that
+    another process ran, and the per-user limit counts every process's jobs.
+    A process that shuts down marks its unfinished jobs failed; jobs left
+    unfinished by a process that died are swept once untouched for `ttl`.
+    """
+
+    def __init__(self, workers: int, queue_size: int, per_user: int, ttl: float, artifact_dir: str):
+        self.workers = workers
+        self.per_user = per_user
+        self.ttl = ttl
+        self.artifact_dir = artifact_dir
+        self._queue: "asyncio.Queue[ExportJob]" = asyncio.Queue(maxsize=queue_size)
+        self._jobs: Dict[str, ExportJob] = {}
+        self._tasks: list = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Finished artifacts stay for other processes to serve until they expire.
+        for job in list(self._jobs.values()):
+            if job.active:
+                job.status = "failed"
+                job.error = "Export was interrupted by a server restart"
+                job.finished_at = time.time()
+                self._save(job)
+        self._jobs.clear()
+
+    def _active_elsewhere(self, user_id: str) -> int:
+        return sum(1 for j in self._stored() if j.user_id == user_id and j.active and j.id not in self._jobs)
+
+    async def submit(self, user_id: str, project_id: str, render: RenderFn, total: int = 0) -> ExportJob:
+        # Other processes' jobs are only on disk, so that count is read off the event loop.
+        elsewhere = await asyncio.to_thread(self._active_elsewhere, user_id)
+        active = elsewhere + sum(1 for j in self._jobs.values() if j.user_id == user_id and j.active)
+        if active >= self.per_user:
+            raise ExportLimitReached(f"At most {self.per_user} exports can run at once")
+
+        job = ExportJob(id=uuid.uuid4().hex, user_id=user_id, project_id=project_id, render=render, total=total)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ExportQueueFull("Export queue is full, please retry shortly")
+        self._jobs[job.id] = job
+        self._save(job)
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id) or self._load(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.artifact_dir, f"{job_id}.json")
+
+    def _save(self, job: ExportJob):
+        path = self._meta_path(job.id)
+        # Unique per write: the render thread's progress saves can overlap a status save.
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(job.to_record(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Failed to save export job {job.id}: {e}")
+
+    def _load(self, job_id: str) -> Optional[ExportJob]:
+        # Ids are uuid4 hex; anything else never names a job file.
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._meta_path(job_id)) as f:
+                return ExportJob.from_record(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _stored(self) -> Iterator[ExportJob]:
+        try:
+            names = os.listdir(self.artifact_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".json"):
+                job = self._load(name[:-len(".json")])
+                if job is not None:
+                    yield job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ExportJob):
+        job.status = "running"
+        self._save(job)
+        saved_at = time.monotonic()
+
+        def on_progress(done: int, total: int):
+            nonlocal saved_at
+            job.completed, job.total = done, total
+            if time.monotonic() - saved_at >= PROGRESS_SAVE_INTERVAL:
+                saved_at = time.monotonic()
+                self._save(job)
+
+        try:
+            file, filename, mime = await asyncio.to_thread(job.render, on_progress)
+            path = os.path.join(self.artifact_dir, job.id)
+            size = await asyncio.to_thread(self._write, path, file)
+            job.path, job.size, job.filename, job.mime = path, size, filename, mime
+            job.status = "done"
+        except Exception as e:
+            print(f"Export job {job.id} failed: {e}")
+            job.error = f"Document generation failed: {str(e)}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+
+    @staticmethod
+    def _write(path: str, src: BinaryIO) -> int:
+        with src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+            return dst.tell()
+
+    def _discard(self, job: ExportJob):
+        self._jobs.pop(job.id, None)
+        for path in (job.path, self._meta_path(job.id)):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _sweep(self, cutoff: float):
+        for job in list(self._stored()):
+            if job.id in self._jobs:
+                continue
+            if job.finished_at is not None:
+                expired = job.finished_at < cutoff
+            else:
+                try:
+                    expired = os.path.getmtime(self._meta_path(job.id)) < cutoff
+                except OSError:
+                    continue
+            if expired:
+                self._discard(job)
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.ttl))
+            cutoff = time.time() - self.ttl
+            for job in list(self._jobs.values()):
+                if job.finished_at is not None and job.finished_at < cutoff:
+                    self._discard(job)
+            try:
+                await asyncio.to_thread(self._sweep, cutoff)
+            except Exception as e:
+                print(f"Export job cleanup failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"queue_depth": self._queue.qsize(), "workers": self.workers, "jobs": statuses}
+
+
+export_jobs = ExportJobManager(
+    workers=settings.EXPORT_JOB_WORKERS,
+    queue_size=settings.EXPORT_JOB_QUEUE_SIZE,
+    per_user=settings.EXPORT_JOBS_PER_USER,
+    ttl=settings.EXPORT_JOB_TTL,
+    artifact_dir=settings.EXPORT_JOB_DIR or os.path.join(tempfile.gettempdir(), "documate-exports"),
+)
@@ -0,0 +1,114 @@
+import asyncio
+import os
+from typing import Any, BinaryIO, Dict, Optional
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportBusy(Exception):
+    pass
+
+
+def file_size(f: BinaryIO) -> int:
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    return size
+
+
+class ExportBytesLimiter:
+    """Caps the bytes of exports this process is rendering or streaming at once.
+
+    A download reserves an estimate before rendering, corrects it to the real
+    size afterwards and releases it once the response is done. When the cap
+    is reached new downloads wait up to `wait_timeout` seconds, then get
+    ExportBusy. A single export bigger than the cap is still let through on
+    its own.
+    """
+
+    def __init__(self, max_bytes: int, wait_timeout: float):
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self._in_flight = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+        self.peak = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _fits(self, size: int) -> bool:
+        return self._in_flight == 0 or self._in_flight + size <= self.max_bytes
+
+    async def acquire(self, size: int):
+        cond = self._condition()
+        async with cond:
+            if not self._fits(size):
+                self.waited += 1
+                try:
+                    await asyncio.wait_for(cond.wait_for(lambda: self._fits(size)), self.wait_timeout)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise ExportBusy("Too many exports in progress, please retry shortly")
+            self._in_flight += size
+            self.peak = max(self.peak, self._in_flight)
+
+    async def release(self, size: int):
+        cond = self._condition()
+        async with cond:
+            self._in_flight = max(0, self._in_flight - size)
+            cond.notify_all()
+
+    async def resize(self, reserved: int, size: int):
+        """Swaps a reservation for the real size without waiting."""
+        if size < reserved:
+            await self.release(reserved - size)
+        else:
+            self._in_flight += size - reserved
+            self.peak = max(self.peak, self._in_flight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight_bytes": self._in_flight,
+            "max_bytes": self.max_bytes,
+            "peak_bytes": self.peak,
+            "waited": self.waited,
+            "rejected": self.rejected,
+        }
+
+
+class FileStreamResponse(StreamingResponse):
+    """Streams an open file in CHUNK_SIZE reads with a Content-Length.
+
+    The file is closed, and `reserved` bytes handed back to export_limiter,
+    once the response finishes or the client goes away.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, media_type: str, headers: Dict[str, str], reserved: int = 0):
+        self.file = file
+        self.reserved = reserved
+        super().__init__(self._chunks(), media_type=media_type, headers={**headers, "Content-Length": str(size)})
+
+    async def _chunks(self):
+        while True:
+            chunk = await run_in_threadpool(self.file.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.file.close()
+            if self.reserved:
+                await export_limiter.release(self.reserved)
+
+
+export_limiter = ExportBytesLimiter(settings.EXPORT_INFLIGHT_MAX_BYTES, settings.EXPORT_INFLIGHT_WAIT)
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Union
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user is waiting on this answer (content, refine)
+    NORMAL = 1       # outlines
+    BULK = 2         # whole-document fan-out and other background work
+
+
+class Ticket:
+    """One call's place in the scheduler queue; promote() can move it up while it waits."""
+
+    __slots__ = ("priority", "_future")
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+        self._future: Optional[asyncio.Future] = None
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute; 0 disables the limit."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def take(self, amount: float) -> float:
+        """Waits until `amount` units are available and returns how long that took."""
+        if not self.enabled:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return waited
+            delay = (amount - self.level) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount: float):
+        # Settles an estimate against the real cost; the level may go negative
+        # so an underestimate is paid back before the next call.
+        if self.enabled:
+            self._refill()
+            self.level = max(-self.capacity, self.level - amount)
+
+
+class GeminiScheduler:
+    """Admission control for Gemini calls.
+
+    Callers queue by Priority (or a Ticket that can be promoted while it
+    waits) for a concurrency slot, then take from the
+    requests- and tokens-per-minute buckets. The concurrency limit is AIMD:
+    it halves (at most once per second) when Gemini throttles us and grows
+    back by about one slot per window of successful calls.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int, rpm: int, tpm: int,
+                 retry_base_delay: float, retry_max_delay: float):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.limit = float(max_concurrency)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        self._waiting = {p: 0 for p in Priority}
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self._wait_total = {p: 0.0 for p in Priority}
+        self._wait_calls = {p: 0 for p in Priority}
+        self._wait_max = 0.0
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def _wake(self):
+        while self._heap and self._in_flight < self._capacity():
+            _, _, fut = heapq.heappop(self._heap)
+            if fut.done():
+                continue
+            self._in_flight += 1
+            fut.set_result(None)
+
+    async def _acquire(self, ticket: Ticket):
+        if not self._heap and self._in_flight < self._capacity():
+            self._in_flight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        ticket._future = fut
+        heapq.heappush(self._heap, [int(ticket.priority), next(self._seq), fut])
+        self._waiting[ticket.priority] += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted a slot just as we were cancelled: hand it on.
+                self._in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            self._waiting[ticket.priority] -= 1
+            ticket._future = None
+
+    def promote(self, ticket: Ticket, priority: Priority):
+        """Raises a call's priority, e.g. when an interactive caller joins a bulk call."""
+        if priority >= ticket.priority:
+            return
+        fut = ticket._future
+        if fut is not None and not fut.done():
+            # The old heap entry stays behind and is skipped once the future is done.
+            self._waiting[ticket.priority] -= 1
+            self._waiting[priority] += 1
+            heapq.heappush(self._heap, [int(priority), next(self._seq), fut])
+        ticket.priority = priority
+
+    @asynccontextmanager
+    async def slot(self, priority: Union[Priority, Ticket], tokens: int):
+        ticket = priority if isinstance(priority, Ticket) else Ticket(priority)
+        started = time.perf_counter()
+        await self._acquire(ticket)
+        try:
+            await self.requests.take(1)
+            await self.tokens.take(tokens)
+            waited = time.perf_counter() - started
+            self.calls += 1
+            self._wait_total[ticket.priority] += waited
+            self._wait_calls[ticket.priority] += 1
+            self._wait_max = max(self._wait_max, waited)
+            yield
+        finally:
+            self._in_flight -= 1
+            self._wake()
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        if actual is not None:
+            self.tokens.adjust(actual - estimated)
+
+    def on_success(self):
+        if self.limit < self.max_concurrency:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_throttle(self):
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= 1.0:
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            self._last_decrease = now
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float]) -> Optional[float]:
+        """Seconds to wait before retry `attempt`, or None when the server asks for longer than we allow."""
+        if retry_after is not None:
+            if retry_after > self.retry_max_delay:
+                return None
+            return retry_after + random.uniform(0, self.retry_base_delay)
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        calls = sum(self._wait_calls.values())
+        return {
+            "max_concurrency": self.max_concurrency,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self._in_flight,
+            "queue_depth": sum(self._waiting.values()),
+            "queued_by_priority": {p.name.lower(): n for p, n in self._waiting.items()},
+            "calls": self.calls,
+            "avg_wait_ms": round(sum(self._wait_total.values()) / calls * 1000, 2) if calls else 0.0,
+            "avg_wait_ms_by_priority": {
+                p.name.lower(): round(self._wait_total[p] / self._wait_calls[p] * 1000, 2) if self._wait_calls[p] else 0.0
+                for p in Priority
+            },
+            "max_wait_ms": round(self._wait_max * 1000, 2),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "rpm_available": round(self.requests.level, 1) if self.requests.enabled else None,
+            "tpm_available": round(self.tokens.level) if self.tokens.enabled else None,
+        }
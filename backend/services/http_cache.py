@@ -0,0 +1,30 @@
+import hashlib
+import json
+from typing import Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+
+def make_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def json_etag(body) -> str:
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return make_etag(hashlib.sha256(raw.encode("utf-8")).hexdigest())
+
+
+def cached_json(body, if_none_match: Optional[str]) -> Response:
+    """JSON response carrying an ETag, or a bare 304 when the client already has it."""
+    etag = json_etag(body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=body, headers=headers)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import settings
+
+
+class ImageCache:
+    """On-disk cache of downloaded section images, evicted LRU by total bytes.
+
+    Files are named by the SHA-256 of the image URL (Supabase Storage URLs
+    point at immutable uploads), so re-exports read them back from disk.
+    Safe to use from the export worker threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    @staticmethod
+    def _digest(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _load(self):
+        # Rebuild the LRU order from whatever a previous process left behind.
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = self._path(name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total += size
+        self._loaded = True
+        self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def get(self, url: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        digest = self._digest(url)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if digest not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(digest)
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(digest, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, url: str, data: bytes):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        digest = self._digest(url)
+        path = self._path(digest)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Image cache write failed: {e}")
+            return
+        with self._lock:
+            self._total -= self._index.pop(digest, 0)
+            self._index[digest] = len(data)
+            self._total += len(data)
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+image_cache = ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
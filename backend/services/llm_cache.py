@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import settings
+
+
+class LLMCache:
+    """Two-tier cache of Gemini completions.
+
+    An in-process LRU with TTL sits in front of a SQLite file that every
+    worker on the host shares. Keys are content hashes of the request, so
+    identical prompts hit regardless of which route or user sent them.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, db_path: Optional[str]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db_ready = False
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+    @staticmethod
+    def make_key(prompt_text: str, model: str, temperature: float, max_tokens: int,
+                 response_schema: Optional[Dict[str, Any]] = None) -> str:
+        parts = [prompt_text, model, temperature, max_tokens]
+        if response_schema is not None:
+            parts.append(response_schema)
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        if not self._db_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if row and row[0] > time.time():
+            return row[0], row[1]
+        return None
+
+    def _disk_set(self, key: str, value: str, expires_at: float, prune: bool):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+            if prune:
+                conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            del self._memory[key]
+            self.expirations += 1
+
+        if self.db_path:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                print(f"LLM cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, *entry)
+                self.disk_hits += 1
+                return entry[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.db_path:
+            self._writes += 1
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, expires_at, self._writes % 100 == 0)
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                print(f"LLM cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_errors": self.disk_errors,
+        }
+
+
+llm_cache = LLMCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl=settings.LLM_CACHE_TTL,
+    db_path=settings.LLM_CACHE_PATH or None,
+)
@@ -0,0 +1,171 @@
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition (format 0.0.4) without the client library. Each
+# recording is a dict update under an uncontended lock, cheap enough to leave
+# on for every request.
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = tuple(float(1024 * 2 ** i) for i in range(0, 17, 2))  # 1 KiB .. 64 MiB
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, row in items:
+            cumulative = 0.0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cumulative)}")
+        return lines
+
+
+class Collected(_Metric):
+    """A counter or gauge read from existing stats at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        try:
+            items = list(self._collect())
+        except Exception as e:
+            print(f"Metrics collector {self.name} failed: {e}")
+            return []
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP (recorded by the middleware in main.py)
+http_requests = Counter("documate_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("documate_http_request_duration_seconds", "HTTP request latency, including streamed bodies.", ("method", "route"))
+http_in_flight = Gauge("documate_http_requests_in_flight", "HTTP requests currently being served.")
+
+# Gemini
+gemini_latency = Histogram("documate_gemini_request_duration_seconds", "Gemini HTTP call latency per attempt.", ("kind",))
+gemini_requests = Counter("documate_gemini_requests_total", "Gemini HTTP calls by response status.", ("kind", "status"))
+gemini_finish_reasons = Counter("documate_gemini_finish_reasons_total", "Gemini candidates by finishReason.", ("reason",))
+gemini_tokens = Counter("documate_gemini_tokens_total", "Tokens reported in Gemini usageMetadata.", ("type",))
+
+# Supabase
+supabase_latency = Histogram("documate_supabase_query_duration_seconds", "PostgREST query latency.", ("query",))
+supabase_errors = Counter("documate_supabase_query_errors_total", "PostgREST queries that raised.", ("query",))
+
+# Images and rendering
+image_fetch_latency = Histogram("documate_image_fetch_duration_seconds", "Section image download latency.")
+image_fetches = Counter("documate_image_fetches_total", "Section image downloads by outcome.", ("result",))
+render_latency = Histogram("documate_render_duration_seconds", "Document render latency.", ("kind", "mode"))
+export_size = Histogram("documate_export_size_bytes", "Size of rendered export files.", ("kind",), buckets=SIZE_BUCKETS)
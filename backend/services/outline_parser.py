@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+OUTLINE_SCHEMA: Dict[str, Any] = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "title": {"type": "STRING"},
+            "description": {"type": "STRING"},
+        },
+        "required": ["title", "description"],
+        "propertyOrdering": ["title", "description"],
+    },
+}
+
+PLACEHOLDER = [{"title": "Introduction", "description": "Please regenerate outline."}]
+
+
+class OutlineSection(BaseModel):
+    title: str
+    description: str = ""
+
+
+_sections = TypeAdapter(List[OutlineSection])
+
+# How often each parse path produced the outline. Anything but "structured"
+# means the model ignored the JSON response mode.
+_stats = {"structured": 0, "json_regex": 0, "field_regex": 0, "line_scrape": 0, "placeholder": 0}
+
+
+def _structured(content: str) -> List[Dict[str, str]]:
+    try:
+        sections = _sections.validate_json(content)
+    except ValidationError:
+        return []
+    return [s.model_dump() for s in sections if s.title.strip()]
+
+
+def _json_regex(content: str) -> List[Dict[str, str]]:
+    outline = []
+    try:
+        json_match = re.search(r'\[.*\]', content, re.DOTALL)
+        if json_match:
+            data = json.loads(json_match.group(0))
+            for item in data:
+                if isinstance(item, dict) and item.get("title"):
+                    outline.append({"title": item["title"], "description": item.get("description", "")})
+    except Exception as e:
+        print(f"JSON Parse failed, switching to fallback: {e}")
+    return outline
+
+
+def _field_regex(content: str) -> List[Dict[str, str]]:
+    titles = re.findall(r'"title":\s*"([^"]+)"', content)
+    descriptions = re.findall(r'"description":\s*"([^"]+)"', content)
+    return [{"title": title, "description": descriptions[i] if i < len(descriptions) else ""}
+            for i, title in enumerate(titles)]
+
+
+def _line_scrape(content: str) -> List[Dict[str, str]]:
+    outline = []
+    for l in (l.strip() for l in content.split("\n")):
+        if not l or l in ['[', ']', '{', '}', '},', '],']:
+            continue
+        clean_l = l.strip('"').strip(',').strip()
+        if clean_l:
+            outline.append({"title": clean_l, "description": ""})
+    return outline
+
+
+_PATHS = (("structured", _structured), ("json_regex", _json_regex),
+          ("field_regex", _field_regex), ("line_scrape", _line_scrape))
+
+
+def parse_outline(content: str) -> Tuple[List[Dict[str, str]], str]:
+    """Returns the outline sections and the name of the parse path that produced them."""
+    for name, parse in _PATHS:
+        outline = parse(content)
+        if outline:
+            _stats[name] += 1
+            return outline, name
+    _stats["placeholder"] += 1
+    return list(PLACEHOLDER), "placeholder"
+
+
+def outline_stats() -> Dict[str, Any]:
+    total = sum(_stats.values())
+    return {
+        **_stats,
+        "fallback_rate": round((total - _stats["structured"]) / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from config import settings
+from services.ai_service import ai_service
+from services.gemini_scheduler import GeminiScheduler, Priority
+from services.prompts import packed_content_messages
+
+PACKED_SCHEMA: Dict[str, Any] = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "content": {"type": "STRING"},
+        },
+        "required": ["index", "content"],
+        "propertyOrdering": ["index", "content"],
+    },
+}
+
+# Rough output size of one section as asked for by content_messages().
+SECTION_OUTPUT_TOKENS = {"word": 600, "powerpoint": 160}
+# Fraction of the output budget a pack is planned to fill, leaving room for
+# sections that run long before Gemini truncates the JSON.
+BUDGET_HEADROOM = 0.75
+
+
+class PackedSection(BaseModel):
+    index: int
+    content: str
+
+
+_items = TypeAdapter(List[PackedSection])
+
+_stats = {"packs": 0, "sections": 0, "filled": 0, "missing": 0}
+
+
+def plan_packs(titles: List[str], document_type: str) -> List[List[int]]:
+    """Greedily groups section indices so each group's estimated output fits one call."""
+    per_section = SECTION_OUTPUT_TOKENS.get(document_type.lower(), SECTION_OUTPUT_TOKENS["word"])
+    budget = settings.PACKED_MAX_OUTPUT_TOKENS * BUDGET_HEADROOM
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, title in enumerate(titles):
+        # JSON keys/quoting plus the title echoed back at the top of the section.
+        cost = per_section + GeminiScheduler.estimate_tokens(title) + 16
+        if current and (used + cost > budget or len(current) >= settings.PACKED_MAX_SECTIONS):
+            packs.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _parse(content: str, count: int) -> List[Optional[str]]:
+    """Splits a packed answer into `count` sections. Sections that are missing,
+    empty, out of range or answered more than once come back as None."""
+    contents: List[Optional[str]] = [None] * count
+    try:
+        items = _items.validate_json(content)
+    except ValidationError as e:
+        print(f"Packed generation returned malformed JSON, falling back: {e.error_count()} errors")
+        return contents
+    seen: Dict[int, int] = {}
+    for item in items:
+        seen[item.index] = seen.get(item.index, 0) + 1
+    for item in items:
+        text = item.content.strip()
+        if 0 <= item.index < count and text and seen[item.index] == 1:
+            contents[item.index] = text
+    return contents
+
+
+async def generate_pack(titles: List[str], topic: str, document_type: str,
+                        bypass_cache: bool = False) -> List[Optional[str]]:
+    """Generates `titles` in one structured call.
+
+    Returns one entry per title; sections the model skipped, duplicated or
+    left empty come back as None so the caller can generate them one by one.
+    Only answers that fill every section are cached.
+    """
+    messages = packed_content_messages(titles, topic, document_type)
+    parsed: Dict[str, List[Optional[str]]] = {}
+
+    def complete(content: str) -> bool:
+        parsed[content] = _parse(content, len(titles))
+        return None not in parsed[content]
+
+    result = await ai_service.generate_completion(messages, max_tokens=settings.PACKED_MAX_OUTPUT_TOKENS,
+                                                  cache=True, bypass_cache=bypass_cache,
+                                                  response_schema=PACKED_SCHEMA, priority=Priority.BULK,
+                                                  timeout=settings.DOCUMENT_SECTION_TIMEOUT,
+                                                  cacheable=complete)
+    contents: List[Optional[str]] = [None] * len(titles)
+    if result.get("status") == 200:
+        contents = parsed.get(result["content"]) or _parse(result["content"], len(titles))
+
+    filled = sum(1 for c in contents if c is not None)
+    _stats["packs"] += 1
+    _stats["sections"] += len(titles)
+    _stats["filled"] += filled
+    _stats["missing"] += len(titles) - filled
+    return contents
+
+
+def packing_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "avg_pack_size": round(_stats["sections"] / _stats["packs"], 2) if _stats["packs"] else 0.0,
+        "fill_rate": round(_stats["filled"] / _stats["sections"], 4) if _stats["sections"] else 0.0,
+    }
@@ -0,0 +1,53 @@
+from typing import Dict, List
+
+
+def content_messages(section_title: str, topic: str, document_type: str) -> List[Dict[str, str]]:
+    if document_type.lower() == "word":
+        system_prompt = f"""Generate detailed content for: {section_title}
+Requirements:
+- 3–4 paragraphs
+- Clear, logical flow
+- Formal and professional tone
+- Relevant to the topic: {topic}
+"""
+    else:
+        system_prompt = f"""Generate slide content for: {section_title}
+Format:
+- Title at top
+- 4–6 bullet points
+- Each point max 12–15 words
+- Topic: {topic}
+- Keep it clean and presentation-ready
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Generate content for section titled: {section_title}"}
+    ]
+
+
+def packed_content_messages(section_titles: List[str], topic: str, document_type: str) -> List[Dict[str, str]]:
+    """Asks for several sections at once, answered as a JSON array keyed by index."""
+    listing = "\n".join(f"{i}. {title}" for i, title in enumerate(section_titles))
+    if document_type.lower() == "word":
+        requirements = """- 3–4 paragraphs per section
+- Clear, logical flow
+- Formal and professional tone"""
+    else:
+        requirements = """- Title at top
+- 4–6 bullet points per section
+- Each point max 12–15 words
+- Keep it clean and presentation-ready"""
+    system_prompt = f"""Generate content for each of the following sections of a {document_type} document.
+Topic: {topic}
+
+Sections:
+{listing}
+
+Requirements for every section:
+{requirements}
+
+Return a JSON array with one object per section: "index" is the section number above and "content" is its text."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Generate content for all {len(section_titles)} sections."}
+    ]
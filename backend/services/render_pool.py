@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Callable, Dict, Optional, Set, Tuple
+from config import settings
+from services import metrics
+from services.document_service import DocumentService
+from services.section_cache import section_cache, section_key
+from services.template_store import template_store
+
+SECTION_FIELDS = ("title", "content", "image_url")
+
+# How often a process-mode render's progress file is read back.
+PROGRESS_POLL_INTERVAL = 0.25
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+def _init_worker():
+    # Runs once per worker process so renders start from parsed masters.
+    DocumentService.preload()
+    template_store.reload()
+
+
+def _ping() -> bool:
+    return True
+
+
+def _render(kind: str, title: str, sections: list, template: Optional[str], images: Dict[str, bytes],
+            fragments: Dict[str, bytes], out: Optional[BinaryIO] = None, on_progress=None) -> Tuple[BinaryIO, Dict[str, bytes]]:
+    known = set(fragments)
+    if kind == "word":
+        out = DocumentService.generate_word(title, sections, on_progress=on_progress, images=images, fragments=fragments, out=out)
+    else:
+        out = DocumentService.generate_powerpoint(title, sections, template=template, on_progress=on_progress, images=images, fragments=fragments, out=out)
+    return out, {key: value for key, value in fragments.items() if key not in known}
+
+
+def _write_progress(path: str, done: int, total: int):
+    with open(path, "w") as f:
+        f.write(f"{done} {total}")
+
+
+def _read_progress(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        with open(path) as f:
+            done, total = f.read().split()
+        return int(done), int(total)
+    except (OSError, ValueError):
+        # Missing, or caught mid-write; the next poll will see it.
+        return None
+
+
+def _render_to_file(kind: str, title: str, sections: list, template: Optional[str], images: Dict[str, bytes],
+                    fragments: Dict[str, bytes], directory: Optional[str],
+                    progress_path: Optional[str] = None) -> Tuple[str, Dict[str, bytes]]:
+    # Worker side: the document goes to a temp file so only its path is pickled back,
+    # and progress goes to another one that the parent polls.
+    on_progress = (lambda done, total: _write_progress(progress_path, done, total)) if progress_path else None
+    fd, path = tempfile.mkstemp(prefix="render-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            _, rendered = _render(kind, title, sections, template, images, fragments, out, on_progress)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rendered
+
+
+def _open_and_unlink(path: str) -> BinaryIO:
+    f = open(path, "rb")
+    try:
+        # The open handle keeps the data readable; nothing is left behind on disk.
+        os.remove(path)
+    except OSError:
+        pass
+    return f
+
+
+class RenderPool:
+    """Runs DOCX/PPTX rendering off the API process.
+
+    In "process" mode renders go to a warm ProcessPoolExecutor whose workers
+    preload templates and are recycled after RENDER_MAX_TASKS_PER_CHILD
+    jobs. Images are downloaded in the parent, so only plain section dicts
+    and image bytes are pickled across; workers write the document to a temp
+    file and hand back its path. Progress is relayed through a small file the
+    worker rewrites after each section. "inline" mode renders into a spooled
+    file in the calling thread and is meant for tests and local development.
+
+    At most `workers` renders are submitted at once, so RENDER_TIMEOUT only
+    runs while a worker is actually busy with the render; waiting for a free
+    worker is bounded separately by the same timeout. A render that overruns
+    moves new work to a fresh pool, and the old pool is killed only after
+    its other renders have finished.
+    """
+
+    def __init__(self, mode: str, workers: int, max_tasks_per_child: int, timeout: float):
+        self.mode = mode
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._pending: Dict[ProcessPoolExecutor, Set[Future]] = {}
+
+        self.renders = 0
+        self.timeouts = 0
+        self.busy = 0
+        self.restarts = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+        for _ in range(self.workers):
+            pool.submit(_ping)
+        return pool
+
+    def start(self):
+        if self.mode != "process":
+            return
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = self._new_pool()
+            self.restarts += 1
+        threading.Thread(target=self._retire, args=(broken,), daemon=True).start()
+
+    def _retire(self, broken: ProcessPoolExecutor):
+        # Renders still running healthily in the old pool get to finish first.
+        # A hung render never returns, so its worker is then killed outright.
+        with self._lock:
+            others = list(self._pending.pop(broken, ()))
+        wait(others, timeout=self.timeout)
+        for process in list(getattr(broken, "_processes", {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        self.start()
+        with self._lock:
+            pool = self._pool
+            future = pool.submit(*args)
+            pending = self._pending.setdefault(pool, set())
+            pending.add(future)
+        future.add_done_callback(pending.discard)
+        return pool, future
+
+    def render(self, kind: str, title: str, sections: list, template: Optional[str] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> BinaryIO:
+        """Returns the rendered document as an open file positioned at the start; the caller closes it."""
+        started = time.perf_counter()
+        out = self._render_file(kind, title, sections, template, on_progress)
+        metrics.render_latency.observe(time.perf_counter() - started, kind, self.mode)
+        metrics.export_size.observe(out.seek(0, os.SEEK_END), kind)
+        out.seek(0)
+        return out
+
+    def _render_file(self, kind: str, title: str, sections: list, template: Optional[str],
+                on_progress: Optional[Callable[[int, int], None]]) -> BinaryIO:
+        images = DocumentService.prefetch_images(sections)
+        fragments = section_cache.get_many(section_key(kind, template if kind != "word" else None, s) for s in sections)
+        self.renders += 1
+
+        if self.mode != "process":
+            out, rendered = _render(kind, title, sections, template, images, fragments, on_progress=on_progress)
+            section_cache.put_many(rendered)
+            return out
+
+        plain = [{key: section.get(key) for key in SECTION_FIELDS} for section in sections]
+        if not self._slots.acquire(timeout=self.timeout):
+            self.busy += 1
+            raise RenderTimeout(f"No render worker became free within {self.timeout:.0f}s")
+        pool = None
+        progress_path = None
+        try:
+            if on_progress:
+                fd, progress_path = tempfile.mkstemp(prefix="render-", suffix=".progress", dir=settings.EXPORT_SPOOL_DIR or None)
+                os.close(fd)
+            pool, future = self._submit(_render_to_file, kind, title, plain, template, images, fragments,
+                                        settings.EXPORT_SPOOL_DIR or None, progress_path)
+            path, rendered = self._result(future, progress_path, on_progress)
+        except FutureTimeout:
+            self.timeouts += 1
+            self._recycle(pool)
+            raise RenderTimeout(f"Rendering took longer than {self.timeout:.0f}s")
+        except BrokenProcessPool:
+            self._recycle(pool or self._pool)
+            raise
+        finally:
+            self._slots.release()
+            if progress_path:
+                try:
+                    os.remove(progress_path)
+                except OSError:
+                    pass
+
+        out = _open_and_unlink(path)
+        section_cache.put_many(rendered)
+        if on_progress:
+            on_progress(len(sections), len(sections))
+        return out
+
+    def _result(self, future: Future, progress_path: Optional[str],
+                on_progress: Optional[Callable[[int, int], None]]):
+        """future.result(self.timeout), relaying the worker's progress meanwhile."""
+        if not progress_path:
+            return future.result(timeout=self.timeout)
+        deadline = time.monotonic() + self.timeout
+        reported = None
+        while True:
+            try:
+                return future.result(timeout=max(0.0, min(PROGRESS_POLL_INTERVAL, deadline - time.monotonic())))
+            except FutureTimeout:
+                if time.monotonic() >= deadline:
+                    raise
+            progress = _read_progress(progress_path)
+            if progress is not None and progress != reported:
+                reported = progress
+                on_progress(*progress)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.mode == "process" else 0,
+            "renders": self.renders,
+            "timeouts": self.timeouts,
+            "busy": self.busy,
+            "restarts": self.restarts,
+        }
+
+
+render_pool = RenderPool(
+    mode=settings.RENDER_MODE,
+    workers=settings.RENDER_WORKERS,
+    max_tasks_per_child=settings.RENDER_MAX_TASKS_PER_CHILD,
+    timeout=settings.RENDER_TIMEOUT,
+)
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from config import settings
+
+
+def section_key(kind: str, template: Optional[str], section: dict) -> str:
+    raw = json.dumps([kind, template, section.get("title"), section.get("content"), section.get("image_url")], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SectionRenderCache:
+    """Serialised XML of rendered section bodies, keyed by section_key().
+
+    Lives in the API process and is handed to renders as a plain dict, so
+    it also works when rendering happens in the process pool. Images are
+    not part of a fragment: their relationships are package-scoped and they
+    are attached again on every export from the image cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                fragment = self._entries.get(key)
+                if fragment is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = fragment
+                self.hits += 1
+        return found
+
+    def put_many(self, fragments: Dict[str, bytes]):
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            for key, fragment in fragments.items():
+                self._total -= len(self._entries.pop(key, b""))
+                self._entries[key] = fragment
+                self._total += len(fragment)
+            while self._total > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+section_cache = SectionRenderCache(settings.SECTION_CACHE_MAX_BYTES)
@@ -0,0 +1,203 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from config import settings
+from services.ai_service import ai_service
+from services.gemini_scheduler import Priority
+from services.prompts import content_messages
+
+Key = Tuple[str, str, str]
+
+
+class _Entry:
+    __slots__ = ("task", "content", "tokens", "expires", "claimed")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.content: Optional[str] = None
+        self.tokens = 0
+        self.expires = 0.0
+        self.claimed = False
+
+
+class SpeculativeContent:
+    """Section content generated ahead of time, right after an outline.
+
+    start() generates the first `sections` outline titles in the background
+    at BULK priority and keeps each answer for `ttl` seconds under the
+    user's (topic, title, documentType). /generate-content then take()s a
+    ready answer instead of calling Gemini. An answer still being generated
+    is claimed, and the request joins the same upstream call via
+    single-flight, which promotes that call to the request's priority. A
+    user's next outline cancels what is left of the previous one, and adding
+    sections drops titles that were edited away.
+    Tokens spent on answers nobody takes are counted as wasted.
+    """
+
+    def __init__(self, sections: int, ttl: float, max_users: int):
+        self.sections = sections
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Dict[Key, _Entry]]" = OrderedDict()
+
+        self.started = 0
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.discarded = 0
+        self.spent_tokens = 0
+        self.used_tokens = 0
+        self.wasted_tokens = 0
+
+    @staticmethod
+    def _tokens(result: Dict[str, Any]) -> int:
+        usage = result.get("usage") or {}
+        return int(usage.get("totalTokenCount") or (usage.get("promptTokenCount") or 0) + (usage.get("candidatesTokenCount") or 0))
+
+    async def _generate(self, entry: _Entry, key: Key):
+        topic, title, document_type = key
+        result = await ai_service.generate_completion(
+            content_messages(title, topic, document_type), cache=True,
+            priority=Priority.BULK, timeout=settings.DOCUMENT_SECTION_TIMEOUT)
+        entry.tokens = self._tokens(result)
+        self.spent_tokens += entry.tokens
+        if entry.claimed:
+            self.used_tokens += entry.tokens
+        elif result.get("status") == 200:
+            entry.content = result["content"]
+            entry.expires = time.monotonic() + self.ttl
+        else:
+            self.failed += 1
+            self.wasted_tokens += entry.tokens
+
+    def _drop(self, entries: Iterable[_Entry]) -> int:
+        dropped = 0
+        for entry in entries:
+            if entry.task is not None and not entry.task.done():
+                entry.task.cancel()
+                self.cancelled += 1
+            elif entry.content is not None:
+                self.wasted_tokens += entry.tokens
+                self.discarded += 1
+            dropped += 1
+        return dropped
+
+    def _sweep(self):
+        now = time.monotonic()
+        for user_id in list(self._users):
+            entries = self._users[user_id]
+            for key in [k for k, e in entries.items() if e.content is not None and e.expires <= now]:
+                self.wasted_tokens += entries.pop(key).tokens
+                self.expired += 1
+            for key in [k for k, e in entries.items() if e.task.done() and e.content is None]:
+                del entries[key]
+            if not entries:
+                del self._users[user_id]
+
+    def start(self, user_id: str, topic: str, titles: Iterable[str], document_type: str):
+        """Replaces the user's speculation with the first `sections` of `titles`."""
+        self.cancel(user_id)
+        self._sweep()
+        if self.sections <= 0:
+            return
+        entries: Dict[Key, _Entry] = {}
+        for title in titles:
+            if len(entries) >= self.sections:
+                break
+            key = (topic, title, document_type)
+            if not title or key in entries:
+                continue
+            entry = _Entry()
+            entry.task = asyncio.ensure_future(self._generate(entry, key))
+            entries[key] = entry
+        if not entries:
+            return
+        self.started += len(entries)
+        self._users[user_id] = entries
+        while len(self._users) > self.max_users:
+            _, evicted = self._users.popitem(last=False)
+            self._drop(evicted.values())
+
+    def take(self, user_id: str, topic: str, title: str, document_type: str) -> Optional[str]:
+        """Returns a ready answer, or None when the caller should call Gemini itself.
+
+        Lookups by users with no speculation outstanding are not counted.
+        """
+        entries = self._users.get(user_id)
+        if not entries:
+            return None
+        entry = entries.pop((topic, title, document_type), None)
+        if entry is None:
+            self.misses += 1
+            return None
+        if not entry.task.done():
+            # Still generating: the caller's identical request joins that call.
+            entry.claimed = True
+            self.hits += 1
+            self.joined += 1
+            return None
+        if entry.content is None:
+            self.misses += 1
+            return None
+        if entry.expires <= time.monotonic():
+            self.wasted_tokens += entry.tokens
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used_tokens += entry.tokens
+        return entry.content
+
+    def discard(self, user_id: str, topic: str, title: str, document_type: str):
+        """Drops one answer, e.g. when the user asked to regenerate that section."""
+        entries = self._users.get(user_id)
+        if entries:
+            entry = entries.pop((topic, title, document_type), None)
+            if entry is not None:
+                self._drop([entry])
+
+    def retain(self, user_id: str, titles: Iterable[str]):
+        """Drops everything whose title is not among `titles` (the outline as saved)."""
+        entries = self._users.get(user_id)
+        if not entries:
+            return
+        keep = set(titles)
+        self._drop([entries.pop(key) for key in [k for k in entries if k[1] not in keep]])
+
+    def cancel(self, user_id: str) -> int:
+        entries = self._users.pop(user_id, None)
+        return self._drop(entries.values()) if entries else 0
+
+    def close(self):
+        for user_id in list(self._users):
+            self.cancel(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        self._sweep()
+        entries = [e for user in self._users.values() for e in user.values()]
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "pending": sum(1 for e in entries if not e.task.done()),
+            "ready": sum(1 for e in entries if e.content is not None),
+            "started": self.started,
+            "hits": self.hits,
+            "joined": self.joined,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "discarded": self.discarded,
+            "spent_tokens": self.spent_tokens,
+            "used_tokens": self.used_tokens,
+            "wasted_tokens": self.wasted_tokens,
+            "wasted_token_ratio": round(self.wasted_tokens / self.spent_tokens, 4) if self.spent_tokens else 0.0,
+        }
+
+
+speculation = SpeculativeContent(settings.SPECULATION_SECTIONS, settings.SPECULATION_TTL, settings.SPECULATION_MAX_USERS)
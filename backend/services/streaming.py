@@ -0,0 +1,33 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def completion_events(chunks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Turns AIService.stream_completion output into SSE frames.
+
+    Text arrives as unnamed `data` events, failures as a single `error`
+    event and a successful stream is terminated by a `done` event.
+    """
+    async for chunk in chunks:
+        if "error" in chunk:
+            yield sse_event({"error": chunk["error"], "status": chunk.get("status", 500)}, event="error")
+            return
+        yield sse_event({"content": chunk["content"]})
+    yield sse_event({}, event="done")
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
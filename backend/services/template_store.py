@@ -0,0 +1,107 @@
+import io
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+BLANK_TEMPLATE = "default"
+
+
+class TemplateStore:
+    """Slide-free PowerPoint masters, parsed once and cloned per export.
+
+    Each template is loaded, stripped of its sample slides and re-serialised
+    to an in-memory package. Opening a template parses that small package
+    instead of the original file. A file whose mtime changed is reloaded on
+    its next use, and reload() re-reads the whole directory. A template
+    with no file falls back to the blank deck, with a warning.
+    """
+
+    def __init__(self, directory: str, expected: List[str]):
+        self.directory = directory
+        self.expected = expected
+        self._masters: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+        self.fallbacks: Dict[str, int] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.pptx")
+
+    @staticmethod
+    def _strip(prs):
+        for i in range(len(prs.slides) - 1, -1, -1):
+            rId = prs.slides._sldIdLst[i].rId
+            prs.part.drop_rel(rId)
+            del prs.slides._sldIdLst[i]
+
+    @staticmethod
+    def _serialise(prs) -> bytes:
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        return buffer.getvalue()
+
+    def _load(self, name: str) -> Tuple[float, bytes]:
+        from pptx import Presentation
+        from pptx.util import Inches
+        if name == BLANK_TEMPLATE:
+            prs = Presentation()
+            prs.slide_width = Inches(13.333)
+            prs.slide_height = Inches(7.5)
+            entry = (0.0, self._serialise(prs))
+        else:
+            path = self._path(name)
+            mtime = os.path.getmtime(path)
+            prs = Presentation(path)
+            self._strip(prs)
+            entry = (mtime, self._serialise(prs))
+        self._masters[name] = entry
+        return entry
+
+    def reload(self) -> Dict[str, List[str]]:
+        """Re-reads every template in the directory and reports what is missing."""
+        with self._lock:
+            self._masters.clear()
+            self._load(BLANK_TEMPLATE)
+            for filename in sorted(os.listdir(self.directory)):
+                name, ext = os.path.splitext(filename)
+                if ext.lower() != ".pptx":
+                    continue
+                try:
+                    self._load(name)
+                except Exception as e:
+                    print(f"Failed to load template {filename}: {e}")
+        return self.validate()
+
+    def validate(self) -> Dict[str, List[str]]:
+        loaded = sorted(name for name in self._masters if name != BLANK_TEMPLATE)
+        missing = [name for name in self.expected if name not in self._masters]
+        return {"loaded": loaded, "missing": missing}
+
+    def open(self, name: Optional[str]):
+        """Returns a fresh, slide-free Presentation for `name`."""
+        name = name or BLANK_TEMPLATE
+        with self._lock:
+            entry = self._masters.get(name)
+            if name != BLANK_TEMPLATE:
+                try:
+                    mtime = os.path.getmtime(self._path(name))
+                except OSError:
+                    self._masters.pop(name, None)
+                    self.fallbacks[name] = self.fallbacks.get(name, 0) + 1
+                    print(f"Template '{name}' not found, using {BLANK_TEMPLATE}.")
+                    name, entry = BLANK_TEMPLATE, self._masters.get(BLANK_TEMPLATE)
+                else:
+                    if entry is None or entry[0] != mtime:
+                        entry = self._load(name)
+            if entry is None:
+                entry = self._load(name)
+        from pptx import Presentation
+        return Presentation(io.BytesIO(entry[1]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.validate(), "master_bytes": sum(len(blob) for _, blob in self._masters.values()),
+                "fallbacks": dict(self.fallbacks)}
+
+
+template_store = TemplateStore(TEMPLATE_DIR, settings.PPT_TEMPLATES)
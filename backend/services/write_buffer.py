@@ -0,0 +1,209 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from supabase_client import db
+
+
+class BufferFull(Exception):
+    pass
+
+
+class WriteFailed(Exception):
+    """The row was not stored. `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+Entry = Tuple[str, Dict[str, Any], "asyncio.Future[None]"]
+
+
+class WriteBehindBuffer:
+    """Coalesces concurrent inserts into `table` into batched writes.
+
+    add() returns once its row is stored, so a client that reloads right
+    after sees its own write, and a row the database refuses is reported to
+    the caller instead of being acknowledged. Rows that arrive while a batch
+    is being written go out together in the next one (up to `max_batch`),
+    after waiting at most `flush_interval` seconds for company. Inserts go
+    out with each row's own user JWT, so RLS still applies. The queue is
+    bounded: when it stays full for `enqueue_timeout` seconds, add() raises
+    BufferFull. Failed batches are retried with backoff; a batch PostgREST
+    rejects is retried row by row so one bad row only fails itself. close()
+    lets the flusher write the batch it holds and everything still queued
+    before it stops.
+    """
+
+    def __init__(self, table: str, max_batch: int, flush_interval: float, max_pending: int,
+                 max_retries: int, enqueue_timeout: float):
+        self.table = table
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: "asyncio.Queue[Entry]" = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+
+        self.flushed_rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped_rows = 0
+        self.dropped_by_cause: Dict[str, int] = {}
+        self.rejected_rows = 0
+        self._flush_ms_total = 0.0
+        self._flush_ms_max = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self._closing.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while not self._queue.empty():
+            await self._flush(self._take(self.max_batch))
+
+    async def add(self, token: str, row: Dict[str, Any]):
+        """Stores `row`; raises BufferFull or WriteFailed when it could not be."""
+        done: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        # Nobody may be left to read the outcome if the caller goes away first.
+        done.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            await asyncio.wait_for(self._queue.put((token, row, done)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_rows += 1
+            raise BufferFull(f"Too many pending {self.table} writes, please retry")
+        # Shielded: a caller that disconnects does not unqueue its row.
+        await asyncio.shield(done)
+
+    def _take(self, limit: int) -> List[Entry]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _get(self, timeout: Optional[float]) -> Optional[Entry]:
+        """The next queued row, or None after `timeout` or, once closing, when the queue is empty."""
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if self._closing.is_set():
+            return None
+        getter = asyncio.ensure_future(self._queue.get())
+        closing = asyncio.ensure_future(self._closing.wait())
+        try:
+            await asyncio.wait({getter, closing}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closing.cancel()
+            if not getter.done():
+                getter.cancel()
+        if getter.done() and not getter.cancelled():
+            return getter.result()
+        return None
+
+    async def _run(self):
+        while True:
+            first = await self._get(None)
+            if first is None:
+                return
+            deadline = time.monotonic() + self.flush_interval
+            batch = [first]
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                item = await self._get(remaining)
+                if item is None:
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Entry]):
+        if not batch:
+            return
+        by_token: Dict[str, List[Tuple[Dict[str, Any], "asyncio.Future[None]"]]] = {}
+        for token, row, done in batch:
+            by_token.setdefault(token, []).append((row, done))
+
+        started = time.perf_counter()
+        for token, rows in by_token.items():
+            await self._insert(token, rows)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self._flush_ms_total += elapsed
+        self._flush_ms_max = max(self._flush_ms_max, elapsed)
+
+    @staticmethod
+    def _settle(entries, error: Optional[Exception] = None):
+        for _, done in entries:
+            if not done.done():
+                if error is None:
+                    done.set_result(None)
+                else:
+                    done.set_exception(error)
+
+    def _drop(self, entries, cause: str, error: Exception, status_code: int):
+        self.dropped_rows += len(entries)
+        self.dropped_by_cause[cause] = self.dropped_by_cause.get(cause, 0) + len(entries)
+        print(f"Dropping {len(entries)} {self.table} rows ({cause}): {error}")
+        self._settle(entries, WriteFailed(f"Could not save {self.table}", status_code))
+
+    async def _insert(self, token: str, entries: List[Tuple[Dict[str, Any], "asyncio.Future[None]"]]):
+        from postgrest.exceptions import APIError
+        rows = [row for row, _ in entries]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await db.execute(db.postgrest(token).table(self.table).insert(rows), f"{self.table}.bulk_insert")
+                self.flushed_rows += len(rows)
+                self._settle(entries)
+                return
+            except asyncio.CancelledError:
+                raise
+            except APIError as e:
+                # PostgREST refused the data, so retrying the same rows cannot help.
+                if len(entries) > 1:
+                    for entry in entries:
+                        await self._insert(token, [entry])
+                else:
+                    # 42501 is Postgres' insufficient_privilege, i.e. an RLS refusal.
+                    self._drop(entries, f"rejected:{e.code or 'unknown'}", e, 403 if e.code == "42501" else 400)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._drop(entries, type(e).__name__, e, 503)
+                    return
+                self.retries += 1
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "flushed_rows": self.flushed_rows,
+            "batches": self.batches,
+            "avg_flush_ms": round(self._flush_ms_total / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self._flush_ms_max, 2),
+            "retries": self.retries,
+            "dropped_rows": self.dropped_rows,
+            "dropped_by_cause": dict(self.dropped_by_cause),
+            "rejected_rows": self.rejected_rows,
+        }
+
+
+def _buffer(table: str) -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        table,
+        max_batch=settings.WRITE_BUFFER_MAX_BATCH,
+        flush_interval=settings.WRITE_BUFFER_FLUSH_INTERVAL,
+        max_pending=settings.WRITE_BUFFER_MAX_PENDING,
+        max_retries=settings.WRITE_BUFFER_MAX_RETRIES,
+        enqueue_timeout=settings.WRITE_BUFFER_ENQUEUE_TIMEOUT,
+    )
+
+
+feedback_buffer = _buffer("feedback")
+refinement_buffer = _buffer("refinements")
@@ -1,6 +1,16 @@
-from supabase import create_client, Client
+import httpx
 import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
 from dotenv import load_dotenv
+from services import metrics
+
+# supabase, postgrest and storage3 are imported on first use; together they
+# are the slowest part of importing the app.
+if TYPE_CHECKING:
+    from supabase import Client
+    from postgrest import AsyncPostgrestClient
+    from storage3 import AsyncStorageClient
 
 load_dotenv()
 
@@ -8,13 +18,105 @@ SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY") or os.getenv("VITE_SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("VITE_SUPABASE_SERVICE_ROLE_KEY")
 
-def supabase_client() -> Client:
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "15"))
+
+def supabase_client() -> "Client":
+    from supabase import create_client
     if not SUPABASE_URL or not SUPABASE_ANON_KEY:
         raise Exception("Supabase URL or ANON KEY missing in environment variables")
     return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
-def supabase_admin() -> Client:
+def supabase_admin() -> "Client":
+    from supabase import create_client
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise Exception("Supabase URL or SERVICE ROLE KEY missing in environment variables")
     return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+
+class SupabaseDB:
+    """Process-wide async access to PostgREST and Storage.
+
+    One pooled httpx.AsyncClient, created in the app lifespan, carries every
+    query. Per-request clients are thin wrappers that only add the caller's
+    JWT as a header, so no connections are opened per request.
+    """
+
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    async def start(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=SUPABASE_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            raise RuntimeError("SupabaseDB used before start()")
+        return self._http
+
+    @staticmethod
+    def _headers(token: Optional[str]) -> Dict[str, str]:
+        if not SUPABASE_URL or not SUPABASE_ANON_KEY:
+            raise Exception("Supabase URL or ANON KEY missing in environment variables")
+        return {
+            "apikey": SUPABASE_ANON_KEY,
+            "Authorization": f"Bearer {token or SUPABASE_ANON_KEY}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+
+    def postgrest(self, token: Optional[str]) -> "AsyncPostgrestClient":
+        from postgrest import AsyncPostgrestClient
+        return AsyncPostgrestClient(f"{SUPABASE_URL}/rest/v1", headers=self._headers(token), http_client=self._client())
+
+    def storage(self, token: Optional[str]) -> "AsyncStorageClient":
+        from storage3 import AsyncStorageClient
+        return AsyncStorageClient(f"{SUPABASE_URL}/storage/v1", headers=self._headers(token), http_client=self._client())
+
+    async def execute(self, query, name: str):
+        """Runs a built query and records its latency under `name`."""
+        started = time.perf_counter()
+        try:
+            return await query.execute()
+        except Exception:
+            metrics.supabase_errors.inc(name)
+            raise
+        finally:
+            metrics.supabase_latency.observe(time.perf_counter() - started, name)
+            elapsed = (time.perf_counter() - started) * 1000
+            timing = self._timings.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            timing["count"] += 1
+            timing["total_ms"] += elapsed
+            timing["max_ms"] = max(timing["max_ms"], elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        return {
+            "max_connections": SUPABASE_MAX_CONNECTIONS,
+            "open_connections": len(getattr(pool, "connections", ())),
+            "queries": {
+                name: {
+                    "count": t["count"],
+                    "avg_ms": round(t["total_ms"] / t["count"], 2),
+                    "max_ms": round(t["max_ms"], 2),
+                }
+                for name, t in self._timings.items()
+            },
+        }
+
+
+db = SupabaseDB()
@@ -0,0 +1,12 @@
+from bench.import_budget import LAZY_MODULES, eager_imports, profile
+
+
+def test_main_does_not_import_lazy_modules():
+    rows = profile()
+    assert "main" in dict(rows)
+    assert eager_imports(rows) == [], f"imported by `import main` but expected lazy (one of {LAZY_MODULES})"
+
+
+def test_eager_imports_spots_submodules():
+    rows = [("main", 1), ("pptx.util", 1), ("fastapi", 1), ("jose", 1)]
+    assert eager_imports(rows) == ["jose", "pptx"]
@@ -0,0 +1,62 @@
+-- Optimistic versioning for sections
+ALTER TABLE public.sections ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION public.bump_section_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  NEW.version = OLD.version + 1;
+  RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER bump_sections_version
+  BEFORE UPDATE ON public.sections
+  FOR EACH ROW
+  EXECUTE FUNCTION public.bump_section_version();
+
+-- Applies many section changes in one round trip. Each change must carry the
+-- version the client last saw; rows whose version moved on are reported as
+-- conflicts and left untouched. Runs with the caller's rights, so RLS applies.
+CREATE OR REPLACE FUNCTION public.batch_update_sections(p_project_id UUID, p_changes JSONB)
+RETURNS TABLE (section_id UUID, result TEXT, current_version INTEGER)
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+  change JSONB;
+  target UUID;
+  new_version INTEGER;
+BEGIN
+  FOR change IN SELECT * FROM jsonb_array_elements(p_changes) LOOP
+    target := (change->>'id')::UUID;
+
+    UPDATE public.sections s SET
+      content = CASE WHEN change ? 'content' THEN change->>'content' ELSE s.content END,
+      image_url = CASE WHEN change ? 'image_url' THEN change->>'image_url' ELSE s.image_url END,
+      order_index = CASE WHEN change ? 'order_index' THEN (change->>'order_index')::INTEGER ELSE s.order_index END
+    WHERE s.id = target
+      AND s.project_id = p_project_id
+      AND s.version = (change->>'version')::INTEGER
+    RETURNING s.version INTO new_version;
+
+    IF FOUND THEN
+      section_id := target;
+      result := 'updated';
+      current_version := new_version;
+    ELSE
+      SELECT s.version INTO new_version
+      FROM public.sections s
+      WHERE s.id = target AND s.project_id = p_project_id;
+
+      section_id := target;
+      result := CASE WHEN FOUND THEN 'conflict' ELSE 'not_found' END;
+      current_version := new_version;
+    END IF;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$;